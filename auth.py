@@ -1,7 +1,12 @@
 # auth.py
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from typing import Optional
 from jose import jwt
 from passlib.context import CryptContext
+import os
+import time
+import threading
 
 # CONFIGURAÇÕES (Em produção, isto vem de variáveis de ambiente .env)
 SECRET_KEY = "sua_chave_secreta_super_dificil" # Troque isto!
@@ -24,4 +29,41 @@ def criar_token_acesso(data: dict):
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+# --- CACHE DO USUÁRIO AUTENTICADO ---
+# Guarda o "principal" já resolvido por email (o "sub" do token) para não ir ao banco a cada requisição.
+# É por processo: alterações feitas em outro worker aparecem em no máximo AUTH_CACHE_TTL segundos.
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "10000"))
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    nome: str
+    email: str
+    perfil: str
+    id_setor: Optional[int]
+    ativo: bool
+
+    @classmethod
+    def de_usuario(cls, usuario):
+        return cls(usuario.id, usuario.nome, usuario.email, usuario.perfil, usuario.id_setor, usuario.ativo)
+
+_cache_lock = threading.Lock()
+_cache_principais = {} # email -> (expira_em, Principal)
+
+def principal_em_cache(email):
+    item = _cache_principais.get(email)
+    if item and item[0] > time.monotonic(): return item[1]
+    return None
+
+def guardar_principal(principal):
+    with _cache_lock:
+        if len(_cache_principais) >= AUTH_CACHE_MAX:
+            _cache_principais.pop(next(iter(_cache_principais))) # descarta o mais antigo
+        _cache_principais[principal.email] = (time.monotonic() + AUTH_CACHE_TTL, principal)
+
+def invalidar_principal(*emails):
+    with _cache_lock:
+        for email in emails: _cache_principais.pop(email, None)
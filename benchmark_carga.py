@@ -0,0 +1,334 @@
+# benchmark_carga.py
+"""Teste de carga reproduzível: sobe a API (uvicorn) num banco local semeado, com servidores falsos
+no lugar do Google Vision e do Supabase Storage, dispara uma mistura de tráfego e grava um JSON
+com p50/p95/p99 e requisições por segundo de cada rota (para comparar entre commits).
+
+Uso (o banco é DESCARTÁVEL: é criado/populado; a semeadura só completa o que faltar):
+    python benchmark_carga.py [--veiculos 10000] [--abastecimentos 1000000] [--usuarios-virtuais 50] [--duracao 60]
+    BENCHMARK_URL=postgresql://... python benchmark_carga.py --workers 4 --saida resultado.json
+    python benchmark_carga.py --comparar resultado_anterior.json
+
+Sem BENCHMARK_URL usa um SQLite em ./benchmark_dados (reaproveitado entre execuções).
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+SENHA = "bench123"
+MIX_PADRAO = "login=5,identificar=15,registrar=20,foto=10,listar_abastecimentos=30,listar_veiculos=20"
+LOTE_SEMEADURA = 10000
+MARCADOR_PLACA = re.compile(rb"SGA-PLACA:([A-Z0-9]+)")
+
+# --- SERVIÇOS FALSOS ---
+
+class _ServicoFalso(BaseHTTPRequestHandler):
+    latencia, variacao = 0.0, 0.0
+    protocol_version = "HTTP/1.1" # keep-alive, como os serviços de verdade
+
+    def log_message(self, *args): pass
+
+    def _esperar(self):
+        time.sleep(max(0.0, self.latencia + random.uniform(-self.variacao, self.variacao)))
+
+    def _responder(self, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _corpo(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+class VisionFalso(_ServicoFalso):
+    """images:annotate: devolve a placa marcada no JPEG (comentário SGA-PLACA:...) ou um texto fixo."""
+    def do_POST(self):
+        pedidos = json.loads(self._corpo()).get("requests", [])
+        self._esperar()
+        respostas = []
+        for pedido in pedidos:
+            achado = MARCADOR_PLACA.search(base64.b64decode(pedido["image"]["content"]))
+            texto = achado.group(1).decode() if achado else "ODOMETRO\n123456 KM"
+            respostas.append({"fullTextAnnotation": {"text": texto}})
+        self._responder({"responses": respostas})
+
+class StorageFalso(_ServicoFalso):
+    """POST /storage/v1/object/{bucket}/{caminho}: só lê o corpo e confirma."""
+    def do_POST(self):
+        self._corpo()
+        self._esperar()
+        self._responder({"Key": self.path.split("/object/", 1)[-1]})
+
+def iniciar_servico(classe, latencia, variacao):
+    handler = type(classe.__name__, (classe,), {"latencia": latencia, "variacao": variacao})
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+# --- BANCO ---
+
+def placa(i):
+    """Placa Mercosul determinística para o veículo i (o tráfego de identificação usa as mesmas)."""
+    letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return f"{letras[i // 676 % 26]}{letras[i // 26 % 26]}{letras[i % 26]}{i // 17576 % 10}{letras[i // 175760 % 26]}{i % 100:02d}"
+
+def _inserir(conn, tabela, linhas):
+    for inicio in range(0, len(linhas), LOTE_SEMEADURA):
+        conn.execute(tabela.insert(), linhas[inicio:inicio + LOTE_SEMEADURA])
+
+def semear(engine, n_veiculos, n_abastecimentos, n_usuarios):
+    """Completa o banco até a escala pedida (em lotes, sem ORM; o geohash é calculado aqui)."""
+    from sqlalchemy import func, select
+    import models, auth, geo
+    aleatorio = random.Random(42)
+    models.Base.metadata.create_all(bind=engine)
+    S, U, V, A, F = (m.__table__ for m in (models.Setor, models.Usuario, models.Veiculo, models.Abastecimento, models.FotoAbastecimento))
+    with engine.begin() as conn:
+        if not conn.execute(select(func.count()).select_from(S)).scalar():
+            _inserir(conn, S, [{"nome": f"Setor {i}"} for i in range(1, 21)])
+        setores = conn.execute(select(S.c.id)).scalars().all()
+        faltam = n_usuarios - conn.execute(select(func.count()).select_from(U)).scalar()
+        if faltam > 0:
+            senha_hash = auth.get_password_hash(SENHA) # um bcrypt só para todos
+            inicio = conn.execute(select(func.count()).select_from(U)).scalar()
+            _inserir(conn, U, [{"nome": f"Bench {i}", "email": f"bench{i}@sga.com", "senha_hash": senha_hash, "ativo": True,
+                                "perfil": "ADMIN" if i == 0 else "EXECUTOR", "id_setor": setores[i % len(setores)]}
+                               for i in range(inicio, inicio + faltam)])
+        inicio = conn.execute(select(func.count()).select_from(V)).scalar()
+        if n_veiculos > inicio:
+            print(f"🌱 Veículos: {inicio} -> {n_veiculos}")
+            _inserir(conn, V, [{"placa": placa(i), "modelo": f"Modelo {i % 50}", "id_setor": setores[i % len(setores)], "capacidade_tanque": 55,
+                                "status": "VENDIDO" if i % 50 == 0 else "ESTOQUE"} for i in range(inicio, n_veiculos)])
+    with engine.begin() as conn:
+        veiculos = conn.execute(select(V.c.id).where(V.c.status != "VENDIDO")).scalars().all()
+        usuarios = conn.execute(select(U.c.id)).scalars().all()
+        inicio = conn.execute(select(func.count()).select_from(A)).scalar()
+        if n_abastecimentos > inicio: print(f"🌱 Abastecimentos: {inicio} -> {n_abastecimentos}")
+        agora = datetime.utcnow()
+        for bloco in range(inicio, n_abastecimentos, LOTE_SEMEADURA):
+            linhas = []
+            for i in range(bloco, min(bloco + LOTE_SEMEADURA, n_abastecimentos)):
+                lat, lon = -30.2 + aleatorio.random() * 0.5, -51.4 + aleatorio.random() * 0.5
+                linhas.append({"id_usuario": usuarios[i % len(usuarios)], "id_veiculo": veiculos[(i * 7) % len(veiculos)],
+                               "data_hora": agora - timedelta(minutes=n_abastecimentos - i), "valor_total": 150 + aleatorio.random() * 200,
+                               "litros": 30 + aleatorio.random() * 20, "nome_posto": f"Posto {i % 300}", "quilometragem": 1000 + i,
+                               "gps_lat": lat, "gps_long": lon, "geohash": geo.codificar(lat, lon),
+                               "status": "PENDENTE_VALIDACAO" if i % 100 == 0 else "APROVADO"})
+            ids = conn.execute(A.insert().returning(A.c.id), linhas).scalars().all()
+            conn.execute(F.insert(), [{"id_abastecimento": id_abastecimento, "tipo": tipo, "url_arquivo": f"seed/{id_abastecimento}_{tipo}.jpg"}
+                                      for id_abastecimento in ids for tipo in ("PLACA", "PAINEL")])
+        return {"veiculos": [(v, placa_veiculo) for v, placa_veiculo in conn.execute(select(V.c.id, V.c.placa).where(V.c.status != "VENDIDO"))],
+                "usuarios": [f"bench{i}@sga.com" for i in range(1, n_usuarios)],
+                "abastecimentos": conn.execute(select(func.min(A.c.id), func.max(A.c.id))).one()}
+
+# --- CARGA ---
+
+def _jpeg(largura, altura, comentario=b"", semente=0):
+    from PIL import Image
+    aleatorio = random.Random(semente)
+    img = Image.new("RGB", (largura, altura), tuple(aleatorio.randrange(256) for _ in range(3)))
+    img.paste(Image.effect_noise((largura // 4, altura // 4), 60).convert("RGB").resize((largura, altura)))
+    saida = io.BytesIO()
+    img.save(saida, "JPEG", quality=90, comment=comentario)
+    return saida.getvalue()
+
+class Resultados:
+    def __init__(self):
+        self.latencias, self.status, self.medindo = {}, {}, False
+
+    def registrar(self, rota, segundos, status):
+        if not self.medindo: return
+        self.latencias.setdefault(rota, []).append(segundos)
+        contagem = self.status.setdefault(rota, {})
+        contagem[status] = contagem.get(status, 0) + 1
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+class UsuarioVirtual:
+    def __init__(self, cliente, dados, resultados, imagens_placa, foto, aleatorio):
+        self.cliente, self.dados, self.resultados = cliente, dados, resultados
+        self.imagens_placa, self.foto_celular, self.aleatorio = imagens_placa, foto, aleatorio
+        self.email = aleatorio.choice(dados["usuarios"])
+        self.cabecalhos, self.etag_veiculos, self.abastecimentos = {}, None, []
+
+    async def _chamar(self, rota, metodo, caminho, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.request(metodo, caminho, **kwargs)
+            status = resposta.status_code
+        except httpx.HTTPError as e:
+            resposta, status = None, type(e).__name__
+        self.resultados.registrar(rota, time.perf_counter() - inicio, status)
+        return resposta
+
+    async def login(self):
+        resposta = await self._chamar("POST /auth/login", "POST", "/auth/login", data={"username": self.email, "password": SENHA})
+        if resposta is not None and resposta.status_code == 200:
+            self.cabecalhos = {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+    async def identificar(self):
+        nome, conteudo = self.aleatorio.choice(self.imagens_placa)
+        await self._chamar("POST /identificar_veiculo/", "POST", "/identificar_veiculo/", headers=self.cabecalhos,
+                           files={"arquivo": (nome, conteudo, "image/jpeg")})
+
+    async def registrar(self):
+        id_veiculo, _ = self.aleatorio.choice(self.dados["veiculos"])
+        corpo = {"id_veiculo": id_veiculo, "valor_total": round(150 + self.aleatorio.random() * 200, 2), "litros": 40,
+                 "nome_posto": "Posto Bench", "quilometragem": self.aleatorio.randrange(1000, 500000),
+                 "gps_lat": -30 + self.aleatorio.random() * 0.3, "gps_long": -51.2 + self.aleatorio.random() * 0.3}
+        resposta = await self._chamar("POST /abastecimentos/", "POST", "/abastecimentos/", headers=self.cabecalhos, json=corpo)
+        if resposta is not None and resposta.status_code == 200: self.abastecimentos.append(resposta.json()["id"])
+
+    async def foto(self):
+        id_abastecimento = self.abastecimentos[-1] if self.abastecimentos else self.aleatorio.randint(*self.dados["abastecimentos"])
+        await self._chamar("POST /abastecimentos/{id}/fotos/", "POST", f"/abastecimentos/{id_abastecimento}/fotos/", headers=self.cabecalhos,
+                           data={"tipo_foto": self.aleatorio.choice(["PLACA", "PAINEL", "BOMBA"])}, files={"arquivo": ("foto.jpg", self.foto_celular, "image/jpeg")})
+
+    async def listar_abastecimentos(self):
+        parametros = self.aleatorio.choice([{}, {"status": "PENDENTE_VALIDACAO"}, {"id_veiculo": self.aleatorio.choice(self.dados["veiculos"])[0]}])
+        await self._chamar("GET /abastecimentos/", "GET", "/abastecimentos/", headers=self.cabecalhos, params=parametros)
+
+    async def listar_veiculos(self):
+        # Como o app: revalida com o ETag da última resposta (304 quando nada mudou)
+        cabecalhos = {**self.cabecalhos, **({"If-None-Match": self.etag_veiculos} if self.etag_veiculos else {})}
+        resposta = await self._chamar("GET /veiculos/", "GET", "/veiculos/", headers=cabecalhos)
+        if resposta is not None and resposta.headers.get("etag"): self.etag_veiculos = resposta.headers["etag"]
+
+async def _usuario(uv, operacoes, pesos, fim):
+    await uv.login()
+    while time.monotonic() < fim:
+        await getattr(uv, uv.aleatorio.choices(operacoes, pesos)[0])()
+
+async def gerar_carga(url, dados, mix, n_usuarios, duracao, aquecimento, semente):
+    operacoes, pesos = zip(*[(nome, float(peso)) for nome, peso in (item.split("=") for item in mix.split(","))])
+    for nome in operacoes:
+        if not hasattr(UsuarioVirtual, nome): raise SystemExit(f"❌ Operação desconhecida no --mix: {nome}")
+    amostra = random.Random(semente).sample(dados["veiculos"], min(500, len(dados["veiculos"])))
+    imagens_placa = [(f"placa_{p}.jpg", _jpeg(640, 480, f"SGA-PLACA:{p}".encode(), i)) for i, (_, p) in enumerate(amostra)]
+    foto = _jpeg(3000, 2250, semente=semente) # foto de celular (~12 MP antes da normalização)
+    resultados = Resultados()
+    limites = httpx.Limits(max_connections=n_usuarios, max_keepalive_connections=n_usuarios)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as cliente:
+        inicio = time.monotonic()
+        fim = inicio + aquecimento + duracao
+        usuarios = [UsuarioVirtual(cliente, dados, resultados, imagens_placa, foto, random.Random(semente + i)) for i in range(n_usuarios)]
+        tarefas = [asyncio.create_task(_usuario(uv, operacoes, pesos, fim)) for uv in usuarios]
+        await asyncio.sleep(aquecimento)
+        resultados.medindo = True
+        inicio_medicao = time.monotonic()
+        await asyncio.gather(*tarefas)
+        return resultados, time.monotonic() - inicio_medicao
+
+def relatorio(resultados, segundos):
+    rotas = {}
+    for rota, latencias in sorted(resultados.latencias.items()):
+        ordenados = sorted(latencias)
+        status = resultados.status[rota]
+        rotas[rota] = {
+            "requisicoes": len(ordenados),
+            "rps": round(len(ordenados) / segundos, 2),
+            "erros": sum(n for s, n in status.items() if not isinstance(s, int) or s >= 500),
+            "status": {str(s): n for s, n in sorted(status.items(), key=str)},
+            **{f"p{p}_ms": round(_percentil(ordenados, p) * 1000, 2) for p in (50, 95, 99)},
+            "media_ms": round(sum(ordenados) / len(ordenados) * 1000, 2),
+            "max_ms": round(ordenados[-1] * 1000, 2),
+        }
+    total = sum(r["requisicoes"] for r in rotas.values())
+    return {"rotas": rotas, "total": {"requisicoes": total, "rps": round(total / segundos, 2), "erros": sum(r["erros"] for r in rotas.values())}}
+
+def comparar(atual, anterior):
+    print(f"\n{'rota':34} {'rps':>16} {'p95 (ms)':>20} {'p99 (ms)':>20}")
+    for rota, r in atual["rotas"].items():
+        a = anterior.get("rotas", {}).get(rota)
+        if not a:
+            print(f"{rota:34} {r['rps']:>16} {r['p95_ms']:>20} {r['p99_ms']:>20}")
+            continue
+        def celula(chave): return f"{a[chave]} → {r[chave]}"
+        print(f"{rota:34} {celula('rps'):>16} {celula('p95_ms'):>20} {celula('p99_ms'):>20}")
+
+def _commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA, capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+def _aguardar_api(url, processo, limite=60):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None: raise SystemExit("❌ A API não subiu (veja a saída do uvicorn acima).")
+        try:
+            if httpx.get(f"{url}/saude/pronto", timeout=2).status_code == 200: return
+        except httpx.HTTPError: pass
+        time.sleep(0.5)
+    raise SystemExit("❌ A API não respondeu a tempo.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--veiculos", type=int, default=10000)
+    parser.add_argument("--abastecimentos", type=int, default=200000)
+    parser.add_argument("--usuarios", type=int, default=200, help="usuários cadastrados (logins do tráfego)")
+    parser.add_argument("--usuarios-virtuais", type=int, default=50, help="clientes simultâneos")
+    parser.add_argument("--duracao", type=float, default=60, help="segundos medidos")
+    parser.add_argument("--aquecimento", type=float, default=5, help="segundos iniciais descartados")
+    parser.add_argument("--mix", default=MIX_PADRAO, help="pesos das operações")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--latencia-vision", type=float, default=0.3, help="segundos por chamada ao Vision falso")
+    parser.add_argument("--latencia-storage", type=float, default=0.1, help="segundos por upload no Storage falso")
+    parser.add_argument("--variacao", type=float, default=0.05, help="± segundos aleatórios nas latências")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="benchmark_resultado.json")
+    parser.add_argument("--comparar", help="resultado anterior (JSON) para comparar")
+    args = parser.parse_args()
+
+    pasta_dados = os.path.join(PASTA, "benchmark_dados")
+    os.makedirs(pasta_dados, exist_ok=True)
+    url_banco = os.getenv("BENCHMARK_URL") or f"sqlite:///{os.path.join(pasta_dados, 'sga.db')}"
+    os.environ["DATABASE_URL"] = url_banco
+    from database import engine
+    inicio = time.monotonic()
+    dados = semear(engine, args.veiculos, args.abastecimentos, args.usuarios)
+    print(f"✅ Banco pronto em {time.monotonic() - inicio:.1f}s")
+
+    vision, url_vision = iniciar_servico(VisionFalso, args.latencia_vision, args.variacao)
+    storage, url_storage = iniciar_servico(StorageFalso, args.latencia_storage, args.variacao)
+    porta = 8765
+    url_api = f"http://127.0.0.1:{porta}"
+    ambiente = {**os.environ, "DATABASE_URL": url_banco, "GOOGLE_API_KEY": "benchmark", "VISION_API_URL": f"{url_vision}/v1/images:annotate",
+                "STORAGE_BACKEND": "supabase", "SUPABASE_URL": url_storage, "SUPABASE_KEY": "benchmark", "STORAGE_LOCAL_DIR": os.path.join(pasta_dados, "fotos")}
+    processo = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta),
+                                 "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"], cwd=PASTA, env=ambiente)
+    try:
+        _aguardar_api(url_api, processo)
+        print(f"🚀 Carga: {args.usuarios_virtuais} usuários virtuais, {args.duracao:.0f}s (+{args.aquecimento:.0f}s de aquecimento)")
+        resultados, segundos = asyncio.run(gerar_carga(url_api, dados, args.mix, args.usuarios_virtuais, args.duracao, args.aquecimento, args.semente))
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+        vision.shutdown()
+        storage.shutdown()
+
+    saida = {"commit": _commit(), "data": datetime.now().isoformat(timespec="seconds"), "banco": url_banco.split(":", 1)[0],
+             "configuracao": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")}, **relatorio(resultados, segundos)}
+    with open(args.saida, "w", encoding="utf-8") as f: json.dump(saida, f, ensure_ascii=False, indent=2)
+    for rota, r in saida["rotas"].items():
+        print(f"{rota:34} {r['rps']:>8} rps  p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  erros {r['erros']}")
+    print(f"📄 Resultado em {args.saida}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f: comparar(saida, json.load(f))
+
+if __name__ == "__main__":
+    main()
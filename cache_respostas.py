@@ -0,0 +1,56 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Response
+import versoes
+import serializacao
+
+# Cache das respostas das listagens de dados de referência (setores, veículos), por versão do recurso.
+# O ETag sai só da versão + parâmetros, então um If-None-Match igual vira 304 sem query e sem
+# serializar nada; um GET sem ETag recebe o corpo já serializado guardado em memória (LRU).
+CACHE_RESPOSTAS_MAX = int(os.getenv("CACHE_RESPOSTAS_MAX", "256"))  # respostas guardadas por processo
+
+_lock = threading.Lock()
+_itens = OrderedDict()  # (recurso, parâmetros) -> (versão, corpo, headers)
+
+def _etag(recurso, versao, parametros):
+    assinatura = hashlib.sha1(repr(parametros).encode()).hexdigest()[:12]
+    return f'"{recurso}-{versao}-{assinatura}"'
+
+def confere(etag, if_none_match):
+    """If-None-Match é uma lista de entity-tags separadas por vírgula (W/ opcional) ou "*".
+    Comparação fraca, como manda o HTTP para o If-None-Match, mas tag a tag e exata (nunca por trecho)."""
+    for item in if_none_match.split(","):
+        item = item.strip()
+        if item == "*" or item.removeprefix("W/") == etag: return True
+    return False
+
+def _guardar(chave, valor):
+    if CACHE_RESPOSTAS_MAX <= 0: return
+    with _lock:
+        _itens[chave] = valor
+        _itens.move_to_end(chave)
+        while len(_itens) > CACHE_RESPOSTAS_MAX: _itens.popitem(last=False)
+
+def responder(request, db, recurso, parametros, gerar):
+    """gerar() -> (lista de dicts no formato da resposta, headers extras); só é chamado quando a versão mudou."""
+    versao = versoes.atual(db, recurso)
+    etag = _etag(recurso, versao, parametros)
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"} # o app sempre revalida, mas com 304 barato
+
+    if confere(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=cabecalhos)
+
+    chave = (recurso, parametros)
+    item = _itens.get(chave)
+    if item and item[0] == versao:
+        _, corpo, extras = item
+    else:
+        dados, extras = gerar()
+        corpo = serializacao.dumps(dados)
+        _guardar(chave, (versao, corpo, extras))
+    return Response(corpo, media_type="application/json", headers={**cabecalhos, **extras})
+
+def limpar():
+    with _lock: _itens.clear()
@@ -0,0 +1,49 @@
+import threading
+import models
+import versoes
+
+# Mapa id <-> nome dos setores, compartilhado pelo processo e recarregado quando a versão "setores" muda.
+_lock = threading.Lock()
+_versao = None
+_por_id = {}
+_por_nome = {}
+
+def _garantir(db):
+    global _versao, _por_id, _por_nome
+    versao = versoes.atual(db, "setores")
+    if versao == _versao: return
+    linhas = db.query(models.Setor.id, models.Setor.nome).order_by(models.Setor.id).all()
+    with _lock:
+        _por_id = {id: nome for id, nome in linhas}
+        _por_nome = {nome: id for id, nome in linhas}
+        _versao = versao
+
+def listar(db):
+    _garantir(db)
+    return [{"id": id, "nome": nome} for id, nome in _por_id.items()]
+
+# Na falta, confere no banco: o mapa pode estar até VERSAO_TTL atrasado em relação a outro worker.
+# Em lote (importação), os que faltam vão num SELECT ... IN só, em vez de um por linha.
+def nomes_por_ids(db, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids: return {}
+    _garantir(db)
+    encontrados = {i: _por_id[i] for i in ids if i in _por_id}
+    faltam = ids - encontrados.keys()
+    if faltam: encontrados.update(db.query(models.Setor.id, models.Setor.nome).filter(models.Setor.id.in_(faltam)).all())
+    return encontrados
+
+def ids_por_nomes(db, nomes):
+    nomes = {n for n in nomes if n}
+    if not nomes: return {}
+    _garantir(db)
+    encontrados = {n: _por_nome[n] for n in nomes if n in _por_nome}
+    faltam = nomes - encontrados.keys()
+    if faltam: encontrados.update(db.query(models.Setor.nome, models.Setor.id).filter(models.Setor.nome.in_(faltam)).all())
+    return encontrados
+
+def nome_por_id(db, id_setor):
+    return nomes_por_ids(db, [id_setor]).get(id_setor)
+
+def id_por_nome(db, nome):
+    return ids_por_nomes(db, [nome]).get(nome)
@@ -0,0 +1,102 @@
+from datetime import datetime
+from sqlalchemy import select, func, case, delete
+from sqlalchemy.dialects import postgresql, sqlite
+import models
+
+# Agregados de consumo por veículo (tabela consumo_veiculos), mantidos na mesma transação
+# que grava o abastecimento. O relatório lê só essas linhas, sem varrer o histórico.
+# km/l pelo método do tanque cheio: (km_max - km_min) / (litros - litros do abastecimento de km_min).
+STATUS_EXCLUIDOS = ("REPROVADO",)
+
+def incluido(status):
+    return status not in STATUS_EXCLUIDOS
+
+def _insert(db):
+    return (postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert)(models.ConsumoVeiculo)
+
+def registrar(db, abastecimento):
+    """Soma um abastecimento novo ao agregado do veículo (upsert atômico). Chamar antes do commit."""
+    if not incluido(abastecimento.status): return
+    C = models.ConsumoVeiculo
+    km, litros, valor = abastecimento.quilometragem, abastecimento.litros or 0, abastecimento.valor_total or 0
+    stmt = _insert(db).values(
+        id_veiculo=abastecimento.id_veiculo, qtd_abastecimentos=1, total_litros=litros, total_valor=valor,
+        km_min=km, km_max=km, litros_km_min=litros if km is not None else None, valor_km_min=valor if km is not None else None,
+        atualizado_em=datetime.utcnow(),
+    )
+    novo = stmt.excluded
+    menor_km = (novo.km_min.is_not(None)) & ((C.km_min.is_(None)) | (novo.km_min < C.km_min))
+    stmt = stmt.on_conflict_do_update(index_elements=[C.id_veiculo], set_={
+        "qtd_abastecimentos": C.qtd_abastecimentos + 1,
+        "total_litros": C.total_litros + novo.total_litros,
+        "total_valor": C.total_valor + novo.total_valor,
+        "km_min": case((menor_km, novo.km_min), else_=C.km_min),
+        "litros_km_min": case((menor_km, novo.litros_km_min), else_=C.litros_km_min),
+        "valor_km_min": case((menor_km, novo.valor_km_min), else_=C.valor_km_min),
+        "km_max": case(((novo.km_max.is_not(None)) & ((C.km_max.is_(None)) | (novo.km_max > C.km_max)), novo.km_max), else_=C.km_max),
+        "atualizado_em": novo.atualizado_em,
+    })
+    db.execute(stmt)
+
+def _agregado(filtro_veiculo=None):
+    """SELECT que calcula o agregado a partir do histórico (usado no recálculo e na reconstrução)."""
+    A = models.Abastecimento
+    A2 = models.Abastecimento.__table__.alias("a2")
+    def do_menor_km(coluna):
+        return (select(coluna).where(A2.c.id_veiculo == A.id_veiculo, A2.c.status.not_in(STATUS_EXCLUIDOS), A2.c.quilometragem.is_not(None))
+                .order_by(A2.c.quilometragem, A2.c.id).limit(1).scalar_subquery())
+    consulta = select(
+        A.id_veiculo, func.count(A.id), func.coalesce(func.sum(A.litros), 0), func.coalesce(func.sum(A.valor_total), 0),
+        func.min(A.quilometragem), func.max(A.quilometragem),
+        do_menor_km(func.coalesce(A2.c.litros, 0)), do_menor_km(A2.c.valor_total), func.current_timestamp(),
+    ).where(A.status.not_in(STATUS_EXCLUIDOS), A.id_veiculo.is_not(None)).group_by(A.id_veiculo)
+    if filtro_veiculo is not None: consulta = consulta.where(A.id_veiculo == filtro_veiculo)
+    return consulta
+
+_COLUNAS = ["id_veiculo", "qtd_abastecimentos", "total_litros", "total_valor", "km_min", "km_max", "litros_km_min", "valor_km_min", "atualizado_em"]
+
+def recalcular_veiculo(db, id_veiculo):
+    """Refaz o agregado de um veículo (quando um abastecimento sai/volta da conta, ex.: revisão)."""
+    db.execute(delete(models.ConsumoVeiculo).where(models.ConsumoVeiculo.id_veiculo == id_veiculo))
+    db.execute(models.ConsumoVeiculo.__table__.insert().from_select(_COLUNAS, _agregado(id_veiculo)))
+
+def reconstruir(db):
+    """Recria a tabela inteira a partir do histórico."""
+    db.execute(delete(models.ConsumoVeiculo))
+    db.execute(models.ConsumoVeiculo.__table__.insert().from_select(_COLUNAS, _agregado()))
+
+def _metricas(km_rodados, litros_consumidos, valor_consumido, total_litros, total_valor):
+    return {
+        "km_rodados": km_rodados,
+        "km_por_litro": round(km_rodados / litros_consumidos, 2) if km_rodados and litros_consumidos else None,
+        "custo_por_km": round(valor_consumido / km_rodados, 4) if km_rodados and valor_consumido else None,
+        "preco_por_litro": round(total_valor / total_litros, 3) if total_litros else None,
+    }
+
+def relatorio(db, agrupar="veiculo", id_setor=None):
+    C, V = models.ConsumoVeiculo, models.Veiculo
+    km_rodados = C.km_max - C.km_min
+    litros_consumidos = C.total_litros - func.coalesce(C.litros_km_min, 0)
+    valor_consumido = C.total_valor - func.coalesce(C.valor_km_min, 0)
+    if agrupar == "setor":
+        # Veículo sem leitura de KM não tem km_rodados: os litros/valor dele também ficam fora do km/l e do R$/km
+        com_km = km_rodados.is_not(None)
+        consulta = select(V.id_setor, func.sum(C.qtd_abastecimentos), func.sum(C.total_litros), func.sum(C.total_valor),
+                          func.sum(km_rodados), func.sum(case((com_km, litros_consumidos))), func.sum(case((com_km, valor_consumido))),
+                          ).join(V, V.id == C.id_veiculo).group_by(V.id_setor)
+        if id_setor: consulta = consulta.where(V.id_setor == id_setor)
+        return [{"id_setor": setor, "qtd_abastecimentos": qtd, "total_litros": litros, "total_valor": valor, **_metricas(km, litros_c, valor_c, litros, valor)}
+                for setor, qtd, litros, valor, km, litros_c, valor_c in db.execute(consulta.order_by(V.id_setor))]
+
+    consulta = select(C.id_veiculo, V.placa, V.id_setor, C.qtd_abastecimentos, C.total_litros, C.total_valor, km_rodados, litros_consumidos, valor_consumido).join(V, V.id == C.id_veiculo)
+    if id_setor: consulta = consulta.where(V.id_setor == id_setor)
+    return [{"id_veiculo": id, "placa": placa, "id_setor": setor, "qtd_abastecimentos": qtd, "total_litros": litros, "total_valor": valor, **_metricas(km, litros_c, valor_c, litros, valor)}
+            for id, placa, setor, qtd, litros, valor, km, litros_c, valor_c in db.execute(consulta.order_by(C.id_veiculo))]
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    db = SessionLocal()
+    reconstruir(db)
+    db.commit()
+    db.close()
+    print("✅ Consumo por veículo reconstruído")
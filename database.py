@@ -1,8 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import urllib.parse
 import os
+import asyncio
+
+def _corrigir_url(url):
+    # Correção para o Render (postgres:// -> postgresql://)
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
 
 # Tenta pegar a URL da nuvem
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -17,26 +25,127 @@ if not DATABASE_URL:
     DATABASE_URL = f"postgresql://{user}:{password}@{host}/{db_name}"
 else:
     print("✅ Usando Banco de Dados da NUVEM")
-    # Correção para o Render (postgres:// -> postgresql://)
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-# ... (código anterior)
+DATABASE_URL = _corrigir_url(DATABASE_URL)
 
-# Correção para o Render
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# Réplica só de leitura (opcional). Sem ela, as leituras vão para o banco principal.
+DATABASE_REPLICA_URL = _corrigir_url(os.getenv("DATABASE_REPLICA_URL"))
 
 # ---> PRINT DE DEBUG AQUI <---
 print(f"DEBUG: Tentando conectar em: {DATABASE_URL[:15]}... (Escondido)")
 
-# Cria a engine
-engine = create_engine(DATABASE_URL)
+# Pool de conexões (valores por worker do uvicorn)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))           # espera por uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))           # recria conexões antes do idle timeout do host
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "nao", "não")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = sem limite
+DB_POOL_AQUECER = int(os.getenv("DB_POOL_AQUECER", str(DB_POOL_SIZE)))  # conexões abertas no startup (0 = nenhuma)
+
+def _criar_engine(url):
+    # SQLite (testes/dev local) não usa pool de conexões do mesmo jeito
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+def _url_async(url):
+    # Mesmo banco, driver assíncrono (asyncpg no Postgres, aiosqlite nos testes)
+    if url.startswith("postgresql://"): return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"): return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+def _criar_engine_async(url):
+    if url.startswith("sqlite"):
+        return create_async_engine(_url_async(url))
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return create_async_engine(
+        _url_async(url),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+# Cria as engines
+engine = _criar_engine(DATABASE_URL)
+engine_leitura = _criar_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
 Base = declarative_base()
 
+# Versões assíncronas (rotas async def). expire_on_commit=False: depois do commit os objetos
+# continuam legíveis sem voltar ao banco (lazy load não funciona em sessão async).
+async_engine = _criar_engine_async(DATABASE_URL)
+async_engine_leitura = _criar_engine_async(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else async_engine
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncSessionLeitura = async_sessionmaker(async_engine_leitura, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_db_leitura():
+    """Para rotas que só leem (listagens e GETs): usa a réplica, se configurada."""
+    db = SessionLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_db_async():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_db_leitura_async():
+    async with AsyncSessionLeitura() as db:
+        yield db
+
+# Aquecimento do pool: chamado no startup (lifespan do main), nunca no import.
+# create_engine não conecta; a primeira conexão só acontece aqui ou na primeira requisição.
+def aquecer(quantidade=DB_POOL_AQUECER):
+    """Abre `quantidade` conexões de uma vez (SELECT 1) e devolve todas ao pool."""
+    for alvo in {engine, engine_leitura}:
+        conexoes = []
+        try:
+            for _ in range(quantidade):
+                conexao = alvo.connect()
+                conexoes.append(conexao)
+                conexao.execute(text("SELECT 1"))
+        finally:
+            for conexao in conexoes: conexao.close()
+
+async def aquecer_async(quantidade=DB_POOL_AQUECER):
+    for alvo in {async_engine, async_engine_leitura}:
+        conexoes = []
+        try:
+            for _ in range(quantidade):
+                conexao = await alvo.connect().start()
+                conexoes.append(conexao)
+                await conexao.execute(text("SELECT 1"))
+        finally:
+            for conexao in conexoes: await conexao.close()
+
+async def verificar_async(timeout=2.0):
+    """SELECT 1 no banco principal (readiness)."""
+    async def consultar():
+        async with async_engine.connect() as conexao:
+            await conexao.execute(text("SELECT 1"))
+    await asyncio.wait_for(consultar(), timeout)
@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database import SessionLocal
+import models
+import ocr_service
+import storage_client
+import imagens
+
+# Fila de análise das fotos: a foto fica em disco (FILA_DIR) e o job na tabela analises_foto,
+# então nada se perde num restart. Um pool fixo de threads faz OCR + checagens + upload.
+FILA_DIR = os.getenv("FILA_DIR", "fila")                   # fora da pasta pública (/fotos): o original ainda não foi analisado
+FILA_WORKERS = int(os.getenv("FILA_WORKERS", "4"))
+FILA_MAX = int(os.getenv("FILA_MAX", "1000"))              # jobs em memória; o excedente espera no banco
+FILA_TENTATIVAS = int(os.getenv("FILA_TENTATIVAS", "3"))
+FILA_VARREDURA = float(os.getenv("FILA_VARREDURA", "30"))  # segundos entre buscas de jobs pendentes
+FILA_TIMEOUT = float(os.getenv("FILA_TIMEOUT", "600"))     # job PROCESSANDO há mais que isso volta a PENDENTE
+
+_fila = queue.Queue(maxsize=FILA_MAX)
+_na_fila = set()
+_lock = threading.Lock()
+_parar = threading.Event()
+_threads = []
+
+def caminho_arquivo(nome_arquivo):
+    return os.path.join(FILA_DIR, nome_arquivo)
+
+def tamanho():
+    return _fila.qsize()
+
+def enfileirar(id_analise):
+    """Coloca o job na fila em memória. Se estiver cheia, a varredura pega depois."""
+    with _lock:
+        if id_analise in _na_fila: return
+        try: _fila.put_nowait(id_analise)
+        except queue.Full: return
+        _na_fila.add(id_analise)
+
+def analisar(db, abastecimento, tipo_foto, conteudo, sha256=None):
+    """Regras de fraude por foto. Retorna o texto do alerta ou ""."""
+    alerta = ""
+    if tipo_foto == "PLACA":
+        txt = ocr_service.ler_texto_imagem(conteudo, sha256)
+        v = db.query(models.Veiculo).filter(models.Veiculo.id == abastecimento.id_veiculo).first()
+        if txt and v.placa.replace("-","") not in txt.replace("-",""): alerta = "Alerta: Placa divergente"
+    elif tipo_foto == "PAINEL":
+        km = ocr_service.ler_km_imagem(conteudo, sha256)
+        if km and abastecimento.quilometragem and km < abastecimento.quilometragem: alerta = f"Alerta: KM Foto ({km}) < Input ({abastecimento.quilometragem})"
+    return alerta
+
+def _remover(caminho):
+    # O job já está gravado: o arquivo sumido (outro processo terminou antes) não é erro do job
+    try: os.remove(caminho)
+    except OSError: pass
+
+def processar(id_analise):
+    db = SessionLocal()
+    try:
+        # "Reserva" o job de forma atômica: só um worker (ou processo) consegue passá-lo para PROCESSANDO
+        reservado = db.query(models.AnaliseFoto).filter(models.AnaliseFoto.id == id_analise, models.AnaliseFoto.status == "PENDENTE").update(
+            {"status": "PROCESSANDO", "iniciado_em": datetime.utcnow(), "tentativas": models.AnaliseFoto.tentativas + 1}, synchronize_session=False)
+        db.commit()
+        if not reservado: return
+
+        analise = db.get(models.AnaliseFoto, id_analise)
+        caminho = caminho_arquivo(analise.nome_arquivo)
+        try:
+            with open(caminho, "rb") as f: original = f.read()
+            # OCR e storage recebem a versão normalizada (rotação do EXIF, tamanho reduzido) + miniatura
+            imagem = imagens.normalizar(original, analise.content_type)
+            abastecimento = db.get(models.Abastecimento, analise.id_abastecimento)
+            alerta = analisar(db, abastecimento, analise.tipo, imagem.conteudo, analise.sha256)
+            if imagem.miniatura:
+                # Foto e miniatura sobem em paralelo
+                url, url_miniatura = storage_client.upload_varios([
+                    (imagem.conteudo, imagens.nome_jpeg(analise.nome_arquivo), imagem.content_type),
+                    (imagem.miniatura, imagens.nome_jpeg(analise.nome_arquivo, "_min"), "image/jpeg"),
+                ])
+            else:
+                url = storage_client.upload_arquivo(imagem.conteudo, analise.nome_arquivo, imagem.content_type)
+                url_miniatura = None
+
+            if alerta:
+                # PLACA e PAINEL do mesmo abastecimento rodam em workers diferentes: concatena no próprio UPDATE
+                A = models.Abastecimento
+                db.query(A).filter(A.id == abastecimento.id).update(
+                    {"justificativa_revisao": func.coalesce(A.justificativa_revisao, "") + " " + alerta}, synchronize_session=False)
+            foto = models.FotoAbastecimento(id_abastecimento=analise.id_abastecimento, tipo=analise.tipo, url_arquivo=url, url_thumbnail=url_miniatura)
+            db.add(foto)
+            db.flush()
+            analise.status, analise.alerta, analise.url_arquivo, analise.id_foto = "CONCLUIDA", alerta, url, foto.id
+            analise.erro, analise.concluido_em = None, datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            print(f"❌ Erro na análise {id_analise}: {e}")
+            db.rollback()
+            analise = db.get(models.AnaliseFoto, id_analise)
+            analise.erro = str(e)
+            analise.status = "PENDENTE" if analise.tentativas < FILA_TENTATIVAS else "ERRO"
+            db.commit()
+            if analise.status == "PENDENTE": return
+        _remover(caminho) # CONCLUIDA, ou ERRO sem mais tentativas
+    finally:
+        db.close()
+
+def _varrer():
+    """Recupera jobs órfãos (restart, fila cheia, falhas a re-tentar) do banco."""
+    db = SessionLocal()
+    try:
+        limite = datetime.utcnow() - timedelta(seconds=FILA_TIMEOUT)
+        db.query(models.AnaliseFoto).filter(models.AnaliseFoto.status == "PROCESSANDO", models.AnaliseFoto.iniciado_em < limite).update(
+            {"status": "PENDENTE"}, synchronize_session=False)
+        db.commit()
+        vagas = FILA_MAX - _fila.qsize()
+        if vagas <= 0: return
+        pendentes = db.query(models.AnaliseFoto.id).filter(models.AnaliseFoto.status == "PENDENTE").order_by(models.AnaliseFoto.id).limit(vagas).all()
+        for (id_analise,) in pendentes: enfileirar(id_analise)
+    finally:
+        db.close()
+
+def _worker():
+    while not _parar.is_set():
+        try: id_analise = _fila.get(timeout=1)
+        except queue.Empty: continue
+        with _lock: _na_fila.discard(id_analise)
+        try: processar(id_analise)
+        except Exception as e: print(f"❌ Erro na fila de fotos: {e}")
+
+def _varredor():
+    while True:
+        try: _varrer()
+        except Exception as e: print(f"❌ Erro na varredura da fila: {e}")
+        if _parar.wait(FILA_VARREDURA): return
+
+def _dentro(pasta, outra):
+    pasta, outra = os.path.realpath(pasta), os.path.realpath(outra)
+    return os.path.commonpath([pasta, outra]) == outra
+
+def iniciar(pasta_publica=None):
+    """pasta_publica: pasta servida sem autenticação; a fila não pode ficar dentro dela."""
+    if pasta_publica and _dentro(FILA_DIR, pasta_publica):
+        raise RuntimeError(f"FILA_DIR ({FILA_DIR}) fica dentro da pasta pública {pasta_publica}: as fotos da fila seriam baixáveis por /fotos")
+    if _threads: return
+    _parar.clear()
+    os.makedirs(FILA_DIR, exist_ok=True)
+    for i in range(FILA_WORKERS):
+        _threads.append(threading.Thread(target=_worker, name=f"fila-fotos-{i}", daemon=True))
+    _threads.append(threading.Thread(target=_varredor, name="fila-fotos-varredor", daemon=True))
+    for t in _threads: t.start()
+
+def parar():
+    _parar.set()
+    for t in _threads: t.join(timeout=5)
+    _threads.clear()
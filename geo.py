@@ -0,0 +1,85 @@
+import os
+import math
+
+# Índice espacial por geohash: cada abastecimento guarda o geohash da coordenada (coluna indexada).
+# Um retângulo vira poucas faixas contíguas de geohash (curva Z), então a busca é só
+# "geohash BETWEEN a AND b" no índice e o custo depende do resultado, não do tamanho da tabela.
+GEOHASH_PRECISAO = 9                                       # ~5 m; é o tamanho gravado no banco
+GEO_MAX_CELULAS = int(os.getenv("GEO_MAX_CELULAS", "32"))  # células na cobertura de uma busca
+RAIO_TERRA_KM = 6371.0
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def _bits(precisao):
+    """(bits de longitude, bits de latitude) de um geohash com essa precisão."""
+    total = 5 * precisao
+    return (total + 1) // 2, total // 2
+
+def _celula(lat, lon, precisao):
+    bits_lon, bits_lat = _bits(precisao)
+    i_lon = min(int((lon + 180.0) / 360.0 * (1 << bits_lon)), (1 << bits_lon) - 1)
+    i_lat = min(int((lat + 90.0) / 180.0 * (1 << bits_lat)), (1 << bits_lat) - 1)
+    return i_lat, i_lon
+
+def _intercalar(i_lat, i_lon, precisao):
+    """Junta os bits (longitude primeiro, como no geohash) num inteiro de 5*precisao bits."""
+    bits_lon, bits_lat = _bits(precisao)
+    valor = 0
+    for b in range(5 * precisao):
+        if b % 2 == 0:
+            bits_lon -= 1
+            valor = (valor << 1) | ((i_lon >> bits_lon) & 1)
+        else:
+            bits_lat -= 1
+            valor = (valor << 1) | ((i_lat >> bits_lat) & 1)
+    return valor
+
+def _texto(valor, precisao):
+    return "".join(_BASE32[(valor >> (5 * (precisao - 1 - i))) & 31] for i in range(precisao))
+
+def codificar(lat, lon, precisao=GEOHASH_PRECISAO):
+    if lat is None or lon is None: return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180): return None
+    return _texto(_intercalar(*_celula(lat, lon, precisao), precisao), precisao)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+def caixa_do_raio(lat, lon, raio_km):
+    """Retângulo (lat_min, lat_max, lon_min, lon_max) que contém o círculo."""
+    d_lat = math.degrees(raio_km / RAIO_TERRA_KM)
+    cos_lat = math.cos(math.radians(lat))
+    d_lon = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(raio_km / (RAIO_TERRA_KM * cos_lat)))
+    return max(lat - d_lat, -90.0), min(lat + d_lat, 90.0), max(lon - d_lon, -180.0), min(lon + d_lon, 180.0)
+
+def _celulas(lat_min, lat_max, lon_min, lon_max, precisao):
+    lat_a, lon_a = _celula(lat_min, lon_min, precisao)
+    lat_b, lon_b = _celula(lat_max, lon_max, precisao)
+    return lat_a, lat_b, lon_a, lon_b
+
+def cobertura(lat_min, lat_max, lon_min, lon_max):
+    """Faixas [(inicio, fim)] de geohash (tamanho GEOHASH_PRECISAO) que cobrem o retângulo.
+
+    Usa a maior precisão com no máximo GEO_MAX_CELULAS células e junta as células vizinhas
+    na ordem do geohash, então costuma sobrar bem menos faixas que células.
+    """
+    precisao = 1
+    for p in range(GEOHASH_PRECISAO, 0, -1):
+        lat_a, lat_b, lon_a, lon_b = _celulas(lat_min, lat_max, lon_min, lon_max, p)
+        if (lat_b - lat_a + 1) * (lon_b - lon_a + 1) <= GEO_MAX_CELULAS:
+            precisao = p
+            break
+    lat_a, lat_b, lon_a, lon_b = _celulas(lat_min, lat_max, lon_min, lon_max, precisao)
+    valores = sorted(_intercalar(i_lat, i_lon, precisao) for i_lat in range(lat_a, lat_b + 1) for i_lon in range(lon_a, lon_b + 1))
+
+    faixas = []
+    for v in valores:
+        if faixas and faixas[-1][1] == v - 1: faixas[-1][1] = v
+        else: faixas.append([v, v])
+    sobra = GEOHASH_PRECISAO - precisao
+    return [(_texto(a, precisao) + "0" * sobra, _texto(b, precisao) + "z" * sobra) for a, b in faixas]
+
+def filtro(coluna, lat_min, lat_max, lon_min, lon_max):
+    """Condições SQLAlchemy (para or_) sobre a coluna de geohash."""
+    return [coluna.between(a, b) for a, b in cobertura(lat_min, lat_max, lon_min, lon_max)]
@@ -0,0 +1,46 @@
+# gerenciar.py
+"""Comandos de manutenção do banco (rodar antes de subir a API; o main.py não cria tabelas).
+
+Uso:
+    python gerenciar.py migrar          # alembic upgrade head (produção / deploy)
+    python gerenciar.py criar_schema    # create_all + marca as migrações como aplicadas (dev, SQLite)
+    python gerenciar.py aquecer         # só testa a conexão (abre o pool uma vez)
+"""
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+def _alembic():
+    from alembic.config import Config
+    return Config(os.path.join(PASTA, "alembic.ini"))
+
+def migrar():
+    from alembic import command
+    command.upgrade(_alembic(), "head")
+    print("✅ Migrações aplicadas")
+
+def criar_schema():
+    from alembic import command
+    import database, models
+    models.Base.metadata.create_all(bind=database.engine)
+    command.stamp(_alembic(), "head")
+    print("✅ Tabelas criadas")
+
+def aquecer():
+    import database
+    database.aquecer(1)
+    print("✅ Banco respondendo")
+
+COMANDOS = {"migrar": migrar, "criar_schema": criar_schema, "aquecer": aquecer}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("comando", choices=COMANDOS)
+    COMANDOS[parser.parse_args().comando]()
+
+if __name__ == "__main__":
+    sys.exit(main())
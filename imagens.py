@@ -0,0 +1,69 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import Optional
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Normalização das fotos antes do OCR e do storage: o celular manda 4–12 MB, mas o OCR da placa
+# e do hodômetro não precisa de mais que ~1600 px no maior lado.
+IMAGEM_LADO_MAX = int(os.getenv("IMAGEM_LADO_MAX", "1600"))
+IMAGEM_QUALIDADE = int(os.getenv("IMAGEM_QUALIDADE", "85"))        # JPEG, 1-95
+MINIATURA_LADO = int(os.getenv("MINIATURA_LADO", "320"))
+MINIATURA_QUALIDADE = int(os.getenv("MINIATURA_QUALIDADE", "70"))
+TAG_ORIENTACAO = 0x0112
+
+@dataclass(frozen=True)
+class ImagemNormalizada:
+    conteudo: bytes
+    content_type: str
+    miniatura: Optional[bytes] = None  # None quando o arquivo não é uma imagem reconhecida
+
+def _jpeg(img, qualidade):
+    saida = io.BytesIO()
+    img.save(saida, "JPEG", quality=qualidade)
+    return saida.getvalue()
+
+def _fonte(origem):
+    """bytes ou arquivo aberto (upload grande em disco) -> algo que o PIL lê do início."""
+    if isinstance(origem, (bytes, bytearray, memoryview)): return io.BytesIO(origem)
+    origem.seek(0)
+    return origem
+
+def _ler(origem):
+    return bytes(origem) if isinstance(origem, (bytes, bytearray, memoryview)) else _fonte(origem).read()
+
+def _abrir(conteudo):
+    img = Image.open(_fonte(conteudo))
+    # JPEG: decodifica direto numa escala reduzida (bem mais rápido que abrir 12 MP e reduzir depois)
+    img.draft("RGB", (IMAGEM_LADO_MAX, IMAGEM_LADO_MAX))
+    img = ImageOps.exif_transpose(img)
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+def normalizar(conteudo, content_type="image/jpeg"):
+    """Aplica a rotação do EXIF, reduz para IMAGEM_LADO_MAX, regrava em JPEG e gera a miniatura.
+
+    Arquivos que não são imagem passam sem alteração (e sem miniatura). conteudo pode ser um arquivo aberto.
+    """
+    try: img = _abrir(conteudo)
+    except (UnidentifiedImageError, OSError): return ImagemNormalizada(_ler(conteudo), content_type)
+    img.thumbnail((IMAGEM_LADO_MAX, IMAGEM_LADO_MAX), Image.LANCZOS)
+    principal = _jpeg(img, IMAGEM_QUALIDADE)
+    img.thumbnail((MINIATURA_LADO, MINIATURA_LADO), Image.BILINEAR, reducing_gap=2.0)
+    return ImagemNormalizada(principal, "image/jpeg", _jpeg(img, MINIATURA_QUALIDADE))
+
+def reduzir(conteudo):
+    """Só os bytes para o OCR. Se já estiver normalizada (JPEG pequeno, sem rotação), devolve como veio.
+
+    Aceita um arquivo aberto: a foto grande é decodificada direto dele, sem ler o arquivo inteiro para a memória.
+    """
+    try:
+        with Image.open(_fonte(conteudo)) as img:
+            if img.format == "JPEG" and max(img.size) <= IMAGEM_LADO_MAX and img.getexif().get(TAG_ORIENTACAO, 1) == 1:
+                return _ler(conteudo)
+    except (UnidentifiedImageError, OSError): return _ler(conteudo)
+    return normalizar(conteudo).conteudo
+
+def nome_jpeg(nome_arquivo, sufixo=""):
+    """foto.png -> foto.jpg / foto_min.jpg"""
+    base = nome_arquivo.rsplit(".", 1)[0] if "." in nome_arquivo else nome_arquivo
+    return f"{base}{sufixo}.jpg"
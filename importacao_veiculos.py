@@ -0,0 +1,135 @@
+import os
+import io
+import csv
+import itertools
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+import models
+import schemas
+import cache_setores
+import indice_placas
+import versoes
+
+# Importação em massa de veículos (CSV do estoque das concessionárias).
+# Valida cada linha com VeiculoCreate e grava em lotes: setores e placas existentes conferidos uma vez
+# por lote e um INSERT ... ON CONFLICT DO NOTHING com várias linhas, em vez de uma ida ao banco por veículo.
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))
+IMPORTACAO_MAX_ERROS = int(os.getenv("IMPORTACAO_MAX_ERROS", "1000"))  # erros detalhados no relatório
+
+def _insert(db):
+    return (postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert)(models.Veiculo)
+
+def _mensagem(erro: ValidationError):
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in erro.errors())
+
+class Relatorio:
+    def __init__(self):
+        self.total = self.inseridos = self.duplicados = 0
+        self.erros = []
+        self.qtd_erros = 0
+
+    def erro(self, linha, placa, mensagem):
+        self.qtd_erros += 1
+        if len(self.erros) < IMPORTACAO_MAX_ERROS: self.erros.append({"linha": linha, "placa": placa, "erro": mensagem})
+
+    def resumo(self):
+        return {"total": self.total, "inseridos": self.inseridos, "duplicados": self.duplicados, "qtd_erros": self.qtd_erros, "erros": self.erros}
+
+def _limpar(dados):
+    return {k.strip(): (v.strip() or None) if isinstance(v, str) else v for k, v in dados.items() if k}
+
+def _validar(numero, dados, setores, relatorio):
+    """Linha do CSV (já limpa) -> dict pronto para o INSERT, ou None (erro registrado). setores: nome -> id."""
+    setor = dados.pop("setor", None)
+    if setor and not dados.get("id_setor"):
+        dados["id_setor"] = setores.get(setor)
+        if dados["id_setor"] is None:
+            relatorio.erro(numero, dados.get("placa"), f"Setor não encontrado: {setor}")
+            return None
+    if dados.get("status") is None: dados.pop("status", None) # vazio = padrão do schema
+    try: veiculo = schemas.VeiculoCreate(**dados)
+    except ValidationError as e:
+        relatorio.erro(numero, dados.get("placa"), _mensagem(e))
+        return None
+    linha = veiculo.dict()
+    linha["data_venda"] = datetime.utcnow() if linha["status"] == "VENDIDO" else None
+    return linha
+
+def _processar_lote(db, brutas, vistas, relatorio):
+    """brutas: [(número da linha, dict do CSV)]. Setores do lote resolvidos de uma vez (nome e id)."""
+    brutas = [(numero, _limpar(dados)) for numero, dados in brutas]
+    setores = cache_setores.ids_por_nomes(db, {dados.get("setor") for _, dados in brutas})
+    validas = []
+    for numero, dados in brutas:
+        linha = _validar(numero, dados, setores, relatorio)
+        if linha is not None: validas.append((numero, linha))
+    existentes = cache_setores.nomes_por_ids(db, {linha["id_setor"] for _, linha in validas})
+    lote = []
+    for numero, linha in validas:
+        if linha["id_setor"] and linha["id_setor"] not in existentes:
+            relatorio.erro(numero, linha["placa"], f"Setor não encontrado: {linha['id_setor']}")
+            continue
+        if linha["placa"] in vistas:
+            relatorio.duplicados += 1
+            relatorio.erro(numero, linha["placa"], f"Placa repetida no arquivo (linha {vistas[linha['placa']]})")
+            continue
+        vistas[linha["placa"]] = numero
+        lote.append((numero, linha))
+    if lote: _gravar_lote(db, lote, relatorio)
+
+def _gravar_lote(db, lote, relatorio):
+    """lote: [(número da linha, dados)]. Descarta placas já cadastradas e insere o resto num comando só."""
+    V = models.Veiculo
+    existentes = set(db.scalars(select(V.placa).where(V.placa.in_([dados["placa"] for _, dados in lote]))))
+    novos = []
+    for numero, dados in lote:
+        if dados["placa"] in existentes:
+            relatorio.duplicados += 1
+            relatorio.erro(numero, dados["placa"], "Placa já cadastrada")
+        else: novos.append((numero, dados))
+    if not novos: return
+    # ON CONFLICT cobre a corrida com outro cadastro entre a consulta acima e o INSERT
+    stmt = _insert(db).on_conflict_do_nothing(index_elements=["placa"]).returning(V.id, V.placa, V.status)
+    inseridos = db.execute(stmt, [dados for _, dados in novos]).all()
+    if inseridos: versoes.incrementar(db, "veiculos")
+    db.commit()
+    gravadas = {v.placa for v in inseridos}
+    for numero, dados in novos:
+        if dados["placa"] not in gravadas:
+            relatorio.duplicados += 1
+            relatorio.erro(numero, dados["placa"], "Placa já cadastrada")
+    for veiculo in inseridos: indice_placas.registrar(veiculo)
+    relatorio.inseridos += len(inseridos)
+
+def importar(db, linhas):
+    """linhas: iterável de dicts (colunas do VeiculoCreate; "setor" pode vir pelo nome). Retorna o relatório.
+
+    Um arquivo quebrado no meio (encoding, CSV malformado) interrompe a leitura, mas o que já foi
+    validado é gravado e o relatório aponta a linha do erro.
+    """
+    relatorio = Relatorio()
+    vistas = {}  # placa -> primeira linha em que apareceu
+    brutas = []
+    numero = 1
+    try:
+        for numero, dados in enumerate(linhas, start=2): # linha 1 = cabeçalho
+            relatorio.total += 1
+            brutas.append((numero, dados))
+            if len(brutas) >= IMPORTACAO_LOTE:
+                _processar_lote(db, brutas, vistas, relatorio)
+                brutas = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # O UTF-8 é decodificado em blocos, então a linha do erro de encoding é aproximada
+        relatorio.erro(numero + 1, None, "O CSV deve estar em UTF-8 (importação interrompida)" if isinstance(e, UnicodeDecodeError)
+                       else f"CSV inválido (importação interrompida): {e}")
+    if brutas: _processar_lote(db, brutas, vistas, relatorio)
+    return relatorio.resumo()
+
+def ler_csv(arquivo_binario):
+    """Lê o CSV em streaming (aceita BOM do Excel e separador ';' ou ',')."""
+    texto = io.TextIOWrapper(arquivo_binario, encoding="utf-8-sig", newline="")
+    cabecalho = texto.readline()
+    separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    return csv.DictReader(itertools.chain([cabecalho], texto), delimiter=separador)
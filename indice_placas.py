@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+import models
+import versoes
+
+# Índice em memória (por processo) das placas normalizadas -> (id, status).
+# A busca no texto do OCR testa só as janelas do tamanho das placas cadastradas,
+# então o custo cresce com o tamanho do texto e não com o tamanho da frota.
+# Outros workers podem alterar veículos, por isso o índice é recarregado quando a versão "veiculos" muda
+# (conferida a cada VERSAO_TTL) e, por garantia, a cada INDICE_PLACAS_TTL segundos.
+INDICE_PLACAS_TTL = float(os.getenv("INDICE_PLACAS_TTL", "300"))
+
+_lock = threading.Lock()
+_placas = {}        # placa normalizada -> (id, status)
+_por_id = {}        # id -> placa normalizada
+_tamanhos = set()   # tamanhos de placa existentes (normalmente só 7)
+_carregado_em = None
+_versao = None
+
+def normalizar(placa): return placa.replace("-", "").replace(" ", "").upper()
+
+def _montar(linhas, versao=None):
+    global _placas, _por_id, _tamanhos, _carregado_em, _versao
+    placas, por_id = {}, {}
+    for id, placa, status in linhas:
+        chave = normalizar(placa)
+        placas[chave] = (id, status)
+        por_id[id] = chave
+    with _lock:
+        _placas, _por_id = placas, por_id
+        _tamanhos = {len(p) for p in placas}
+        _carregado_em = time.monotonic()
+        _versao = versao
+
+def _expirado():
+    return _carregado_em is None or time.monotonic() - _carregado_em > INDICE_PLACAS_TTL
+
+def garantir(db):
+    """Carrega (ou recarrega, se a versão mudou ou expirou) o índice a partir do banco."""
+    versao = versoes.atual(db, "veiculos") # lida antes das linhas: uma escrita no meio só causa uma recarga a mais
+    if _expirado() or versao != _versao:
+        _montar(db.query(models.Veiculo.id, models.Veiculo.placa, models.Veiculo.status).all(), versao)
+
+def variantes(placa):
+    """Formas em que a placa pode estar gravada (ABC1D23 / ABC-1D23): busca por igualdade no índice do banco."""
+    chave = normalizar(placa)
+    return [chave, f"{chave[:3]}-{chave[3:]}"] if len(chave) == 7 else [chave]
+
+def registrar(veiculo):
+    """Chamado após criar/atualizar um veículo."""
+    global _tamanhos
+    if _carregado_em is None: return
+    with _lock:
+        antiga = _por_id.pop(veiculo.id, None)
+        if antiga is not None: _placas.pop(antiga, None)
+        chave = normalizar(veiculo.placa)
+        _placas[chave] = (veiculo.id, veiculo.status)
+        _por_id[veiculo.id] = chave
+        if len(chave) not in _tamanhos: _tamanhos = _tamanhos | {len(chave)}
+
+def remover(id_veiculo):
+    """Chamado após deletar um veículo."""
+    with _lock:
+        chave = _por_id.pop(id_veiculo, None)
+        if chave is not None: _placas.pop(chave, None)
+
+def buscar(texto):
+    """Retorna (id, status) da placa cadastrada encontrada no texto, ou None.
+    Tenta primeiro o texto inteiro e depois as janelas, da esquerda para a direita."""
+    texto = normalizar(texto)
+    placas = _placas
+    if texto in placas: return placas[texto]
+    for tamanho in sorted(_tamanhos):
+        for i in range(len(texto) - tamanho + 1):
+            achado = placas.get(texto[i:i + tamanho])
+            if achado: return achado
+    return None
@@ -0,0 +1,61 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import exists
+from database import SessionLocal
+import models
+import indice_placas
+import versoes
+
+# Remove periodicamente os veículos VENDIDOS há mais de VENDIDO_RETENCAO_HORAS, em lotes pequenos
+# (cada lote é uma transação curta). Veículos com abastecimentos ficam: o histórico depende deles.
+VENDIDO_RETENCAO_HORAS = float(os.getenv("VENDIDO_RETENCAO_HORAS", "48"))
+LIMPEZA_INTERVALO = float(os.getenv("LIMPEZA_INTERVALO", "600")) # segundos
+LIMPEZA_LOTE = int(os.getenv("LIMPEZA_LOTE", "500"))
+
+_parar = threading.Event()
+_thread = None
+
+def limpar_expirados():
+    """Executa uma rodada completa. Retorna quantos veículos foram removidos."""
+    V = models.Veiculo
+    limite = datetime.utcnow() - timedelta(hours=VENDIDO_RETENCAO_HORAS)
+    tem_abastecimento = exists().where(models.Abastecimento.id_veiculo == V.id)
+    total = 0
+    db = SessionLocal()
+    try:
+        while not _parar.is_set():
+            ids = [id for (id,) in db.query(V.id).filter(V.status == "VENDIDO", V.data_venda < limite, ~tem_abastecimento).order_by(V.data_venda).limit(LIMPEZA_LOTE).all()]
+            if not ids: break
+            db.query(V).filter(V.id.in_(ids), V.status == "VENDIDO").delete(synchronize_session=False)
+            versoes.incrementar(db, "veiculos")
+            db.commit()
+            for id in ids: indice_placas.remover(id)
+            total += len(ids)
+            if len(ids) < LIMPEZA_LOTE: break
+    finally:
+        db.close()
+    if total: print(f"🧹 {total} veículo(s) vendido(s) removido(s)")
+    return total
+
+def _loop():
+    while True:
+        try: limpar_expirados()
+        except Exception as e: print(f"❌ Erro na limpeza de vendidos: {e}")
+        if _parar.wait(LIMPEZA_INTERVALO): return
+
+def iniciar():
+    global _thread
+    if _thread: return
+    _parar.clear()
+    _thread = threading.Thread(target=_loop, name="limpeza-vendidos", daemon=True)
+    _thread.start()
+
+def parar():
+    global _thread
+    _parar.set()
+    if _thread: _thread.join(timeout=5)
+    _thread = None
+
+if __name__ == "__main__":
+    limpar_expirados()
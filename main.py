@@ -1,24 +1,90 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form, Query, Request, Response, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_, func
 from jose import jwt, JWTError
-from database import get_db, engine
+from database import get_db, get_db_leitura, get_db_async, get_db_leitura_async, SessionLeitura
+import database
 from dotenv import load_dotenv
 import models, schemas, auth
-import shutil
 import storage_client
 import re
 import os
+import asyncio
 import uuid
+import base64
+import csv
+import io
 import ocr_service
-from datetime import datetime, timedelta
+import ocr_cache
+import indice_placas
+import upload_buffer
+import fila_fotos
+import versoes
+import cache_setores
+import limpeza_vendidos
+import consumo
+import pontuacao_fraude
+import geo
+import importacao_veiculos
+import cache_respostas
+import serializacao
+import orjson
+import metricas
+import orcamento_queries
+from typing import Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
 
 load_dotenv()
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="SGA - Sistema de Gestão de Abastecimento")
+# O import não toca no banco nem em serviço externo: o esquema é criado/migrado por comando
+# (python gerenciar.py migrar) e os clientes HTTP nascem no primeiro uso. No startup o pool é
+# aquecido em segundo plano; /saude/pronto só responde 200 depois disso.
+_estado = {"pronto": False, "storage": None} # storage: erro de configuração (só o envio de fotos fica fora)
+
+async def _aquecer_pool():
+    tentativa = 0
+    while True:
+        try:
+            await database.aquecer_async()
+            await run_in_threadpool(database.aquecer)
+            _estado["pronto"] = True
+            print("✅ Pool de conexões aquecido")
+            return
+        except Exception as e:
+            espera = min(30, 2 ** tentativa)
+            print(f"⚠️ Banco indisponível no startup ({e.__class__.__name__}); nova tentativa em {espera}s")
+            await asyncio.sleep(espera)
+            tentativa += 1
+
+def _verificar_storage():
+    # Sem storage configurado só as fotos param: login, abastecimentos e relatórios seguem no ar
+    try: storage_client.backend()
+    except storage_client.ErroStorage as e:
+        _estado["storage"] = str(e)
+        print(f"❌ {e} Envio de fotos desligado.")
+        return False
+    _estado["storage"] = None
+    return True
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    if _verificar_storage(): fila_fotos.iniciar(PASTA_FOTOS) # sem storage, os jobs esperam PENDENTE no banco
+    limpeza_vendidos.iniciar()
+    aquecimento = asyncio.create_task(_aquecer_pool())
+    yield
+    aquecimento.cancel()
+    fila_fotos.parar()
+    limpeza_vendidos.parar()
+
+app = FastAPI(title="SGA - Sistema de Gestão de Abastecimento", lifespan=ciclo_de_vida)
 
 origins = ["*"] 
 app.add_middleware(
@@ -27,77 +93,152 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Proximo-Cursor", "ETag", "X-Query-Count"],
 )
-
-os.makedirs("uploads", exist_ok=True)
-app.mount("/fotos", StaticFiles(directory="uploads"), name="fotos")
+# Respostas grandes vão comprimidas para quem manda Accept-Encoding: gzip (o app mobile)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MINIMO", "1000")), compresslevel=int(os.getenv("GZIP_NIVEL", "6")))
+app.add_middleware(metricas.MetricasMiddleware, router=app.router)
+app.add_middleware(orcamento_queries.OrcamentoMiddleware) # QUERY_ORCAMENTO_MODO=log|erro em dev/CI
+metricas.Medidor("sga_fila_fotos_tamanho", "Análises de foto esperando na fila em memória", funcao=fila_fotos.tamanho)
+metricas.Medidor("sga_ocr_cache_itens_memoria", "Resultados do OCR no cache em memória", funcao=ocr_cache.itens_memoria)
+
+PASTA_FOTOS = "uploads" # servida sem autenticação
+os.makedirs(PASTA_FOTOS, exist_ok=True)
+app.mount("/fotos", StaticFiles(directory=PASTA_FOTOS), name="fotos")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_usuario_atual(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Paginação das listagens
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+GEO_RAIO_MAX_KM = float(os.getenv("GEO_RAIO_MAX_KM", "500"))
+
+# --- SAÚDE ---
+@app.get("/saude/vivo", include_in_schema=False)
+@orcamento_queries.limite(0)
+def saude_vivo():
+    # Liveness: o processo responde (não depende do banco)
+    return {"status": "vivo"}
+
+@app.get("/saude/pronto", include_in_schema=False)
+@orcamento_queries.limite(1)
+async def saude_pronto():
+    # Readiness: pool aquecido e banco respondendo
+    if not _estado["pronto"]: return serializacao.RespostaJSON({"status": "aquecendo"}, status_code=503)
+    try: await database.verificar_async()
+    except Exception: return serializacao.RespostaJSON({"status": "banco indisponível"}, status_code=503)
+    return {"status": "pronto", "storage": _estado["storage"] or "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+@orcamento_queries.limite(0)
+def exportar_metricas():
+    # Formato texto do Prometheus (por processo/worker)
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def get_usuario_atual(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db_async)) -> auth.Principal:
     try:
         payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
         email: str = payload.get("sub")
         if email is None: raise HTTPException(status_code=401, detail="Token inválido")
     except JWTError: raise HTTPException(status_code=401, detail="Token inválido")
-    user = db.query(models.Usuario).filter(models.Usuario.email == email).first()
+    principal = auth.principal_em_cache(email)
+    if principal: return principal
+    user = (await db.execute(select(models.Usuario).where(models.Usuario.email == email))).scalars().first()
     if user is None: raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    return user
+    principal = auth.Principal.de_usuario(user)
+    auth.guardar_principal(principal)
+    return principal
 
 # --- AUTH ---
 @app.post("/auth/login", response_model=schemas.TokenOutput)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    usuario = db.query(models.Usuario).filter(models.Usuario.email == form_data.username).first()
-    if not usuario or not auth.verificar_senha(form_data.password, usuario.senha_hash):
+@orcamento_queries.limite(1)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db_async)):
+    usuario = (await db.execute(select(models.Usuario).where(models.Usuario.email == form_data.username))).scalars().first()
+    # bcrypt é CPU pura: roda no threadpool para não travar o event loop
+    if not usuario or not await run_in_threadpool(auth.verificar_senha, form_data.password, usuario.senha_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email ou senha incorretos")
     token_acesso = auth.criar_token_acesso(data={"sub": usuario.email, "role": usuario.perfil})
     return {"access_token": token_acesso, "token_type": "bearer", "perfil": usuario.perfil}
 
 # --- SETORES ---
 @app.post("/setores/", response_model=schemas.SetorResponse)
-def criar_setor(setor: schemas.SetorCreate, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(8)
+def criar_setor(setor: schemas.SetorCreate, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Apenas Admin")
-    if db.query(models.Setor).filter(models.Setor.nome == setor.nome).first():
+    if cache_setores.id_por_nome(db, setor.nome):
         raise HTTPException(400, detail="Setor já existe")
     
     novo = models.Setor(nome=setor.nome)
     db.add(novo)
+    versoes.incrementar(db, "setores")
     db.commit()
     db.refresh(novo)
     return novo
 
 @app.get("/setores/", response_model=list[schemas.SetorResponse])
-def listar_setores(db: Session = Depends(get_db)):
-    return db.query(models.Setor).all()
+@orcamento_queries.limite(2)
+def listar_setores(request: Request, db: Session = Depends(get_db_leitura)):
+    saida = serializacao.campos(schemas.SetorResponse)
+    return cache_respostas.responder(request, db, "setores", (), lambda: (serializacao.projetar(cache_setores.listar(db), saida), {}))
 
 @app.delete("/setores/{id}")
-def deletar_setor(id: int, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(5)
+def deletar_setor(id: int, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Apenas Admin")
     s = db.query(models.Setor).filter(models.Setor.id == id).first()
     if not s: raise HTTPException(404, detail="Não encontrado")
     db.delete(s)
+    versoes.incrementar(db, "setores")
+    versoes.incrementar(db, "veiculos") # id_setor dos veículos vira NULL
     db.commit()
     return {"mensagem": "Deletado"}
 
 # --- VEÍCULOS ---
 @app.get("/veiculos/", response_model=list[schemas.VeiculoResponse])
-def listar_veiculos(db: Session = Depends(get_db)):
-    limite = datetime.utcnow() - timedelta(hours=48)
-    expirados = db.query(models.Veiculo).filter(models.Veiculo.status == "VENDIDO", models.Veiculo.data_venda < limite).all()
-    for c in expirados: db.delete(c)
-    if expirados: db.commit()
-    return db.query(models.Veiculo).all()
+@orcamento_queries.limite(2)
+def listar_veiculos(request: Request, status: Optional[str] = None, id_setor: Optional[int] = None, cursor: Optional[int] = None, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO), fields: Optional[str] = None, db: Session = Depends(get_db_leitura)):
+    # Só leitura: a remoção dos vendidos expirados é feita pelo limpeza_vendidos
+    V = models.Veiculo
+    saida = serializacao.campos(schemas.VeiculoResponse, fields)
+    def gerar():
+        # Só as colunas necessárias, em tuplas (sem objetos ORM nem modelo Pydantic por linha)
+        nomes = serializacao.colunas(V, saida, ("id",))
+        consulta = db.query(*[getattr(V, c) for c in nomes])
+        if status: consulta = consulta.filter(V.status == status)
+        if id_setor: consulta = consulta.filter(V.id_setor == id_setor)
+        if cursor: consulta = consulta.filter(V.id > cursor)
+        veiculos = serializacao.dicts(consulta.order_by(V.id).limit(limite + 1).all(), nomes)
+        extras = {}
+        if len(veiculos) > limite:
+            veiculos = veiculos[:limite]
+            extras["X-Proximo-Cursor"] = str(veiculos[-1]["id"])
+        return serializacao.projetar(veiculos, saida), extras
+    # Resposta em cache pela versão "veiculos" (ETag / 304 no polling do app)
+    return cache_respostas.responder(request, db, "veiculos", (status, id_setor, cursor, limite, tuple(saida)), gerar)
 
 @app.post("/veiculos/", response_model=schemas.VeiculoResponse)
+@orcamento_queries.limite(7)
 def criar_veiculo(veiculo: schemas.VeiculoCreate, db: Session = Depends(get_db)):
     if db.query(models.Veiculo).filter(models.Veiculo.placa == veiculo.placa).first(): raise HTTPException(400, detail="Veículo já existe")
     novo = models.Veiculo(**veiculo.dict())
     if novo.status == "VENDIDO": novo.data_venda = datetime.utcnow()
     db.add(novo)
+    versoes.incrementar(db, "veiculos")
     db.commit()
     db.refresh(novo)
+    indice_placas.registrar(novo)
     return novo
 
+@app.post("/veiculos/importar")
+@orcamento_queries.limite(None, motivo="em massa: ~2 comandos por lote de IMPORTACAO_LOTE linhas (o custo cresce com o arquivo)")
+def importar_veiculos(arquivo: UploadFile = File(...), db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    # CSV com cabeçalho (placa, modelo, fabricante, cor, ano_fabricacao, chassi, id_setor ou setor, capacidade_tanque, status)
+    if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Apenas Admin")
+    try: linhas = importacao_veiculos.ler_csv(arquivo.file)
+    except UnicodeDecodeError: raise HTTPException(400, detail="O CSV deve estar em UTF-8")
+    return importacao_veiculos.importar(db, linhas)
+
 @app.put("/veiculos/{veiculo_id}", response_model=schemas.VeiculoResponse)
+@orcamento_queries.limite(4)
 def atualizar_veiculo(veiculo_id: int, dados: schemas.VeiculoUpdate, db: Session = Depends(get_db)):
     veiculo = db.query(models.Veiculo).filter(models.Veiculo.id == veiculo_id).first()
     if not veiculo: raise HTTPException(404, detail="Não encontrado")
@@ -107,140 +248,355 @@ def atualizar_veiculo(veiculo_id: int, dados: schemas.VeiculoUpdate, db: Session
     if dados.cor: veiculo.cor = dados.cor
     if dados.chassi: veiculo.chassi = dados.chassi
     if dados.id_setor: veiculo.id_setor = dados.id_setor
+    if dados.capacidade_tanque: veiculo.capacidade_tanque = dados.capacidade_tanque
     
     if dados.status:
         veiculo.status = dados.status
         if dados.status == "VENDIDO": veiculo.data_venda = datetime.utcnow()
         else: veiculo.data_venda = None
             
+    versoes.incrementar(db, "veiculos")
     db.commit()
     db.refresh(veiculo)
+    indice_placas.registrar(veiculo)
     return veiculo
 
 @app.delete("/veiculos/{veiculo_id}")
+@orcamento_queries.limite(3)
 def deletar_veiculo(veiculo_id: int, db: Session = Depends(get_db)):
     veiculo = db.query(models.Veiculo).filter(models.Veiculo.id == veiculo_id).first()
     if not veiculo: raise HTTPException(404, detail="Não encontrado")
     db.delete(veiculo)
+    versoes.incrementar(db, "veiculos")
     db.commit()
+    indice_placas.remover(veiculo_id)
     return {"mensagem": "Removido"}
 
 # --- IA ---
-def limpar_placa(texto): return texto.replace("-", "").replace(" ", "").upper()
+limpar_placa = indice_placas.normalizar
 
 @app.post("/identificar_veiculo/", response_model=schemas.VeiculoResponse)
-def identificar_veiculo(arquivo: UploadFile = File(...), db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
-    extensao = arquivo.filename.split(".")[-1]
-    nome_arquivo = f"temp_search_{uuid.uuid4().hex}.{extensao}"
-    caminho = f"uploads/{nome_arquivo}"
-    with open(caminho, "wb") as b: shutil.copyfileobj(arquivo.file, b)
-
-    texto_ocr = ocr_service.ler_texto_imagem(caminho)
-    if os.path.exists(caminho): os.remove(caminho) 
+@orcamento_queries.limite(4)
+async def identificar_veiculo(arquivo: UploadFile = File(...), db: AsyncSession = Depends(get_db_leitura_async), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    with await upload_buffer.receber_async(arquivo) as recebido:
+        texto_ocr = await ocr_service.ler_texto_imagem_async(recebido.abrir(), recebido.sha256)
     if not texto_ocr: raise HTTPException(status_code=404, detail="Placa ilegível")
 
+    texto = limpar_placa(texto_ocr)
     padrao = re.compile(r'[A-Z]{3}[0-9][0-9A-Z][0-9]{2}')
-    match = padrao.search(limpar_placa(texto_ocr))
-    candidata = match.group(0) if match else limpar_placa(texto_ocr)
-
-    veiculo = db.query(models.Veiculo).filter(models.Veiculo.placa == candidata).first()
-    if veiculo: 
+    match = padrao.search(texto)
+    candidata = match.group(0) if match else texto
+
+    await db.run_sync(indice_placas.garantir)
+    veiculo = None
+    achado = indice_placas.buscar(candidata) or indice_placas.buscar(texto_ocr)
+    if achado:
+        # O índice acompanha a versão "veiculos": o VENDIDO é respondido sem ir ao banco
+        if achado[1] == "VENDIDO": raise HTTPException(400, detail="Veículo VENDIDO.")
+        veiculo = await db.get(models.Veiculo, achado[0]) # a resposta precisa do cadastro completo
+        # O índice é por processo: a placa pode ter sido trocada (ou o veículo removido) em outro worker
+        if veiculo is None or limpar_placa(veiculo.placa) not in texto:
+            indice_placas.remover(achado[0])
+            if veiculo is not None: indice_placas.registrar(veiculo)
+            veiculo = None
+    if veiculo is None:
+        # Fora do índice (criado/alterado em outro worker há menos de INDICE_PLACAS_TTL): busca pelo índice do banco
+        V = models.Veiculo
+        veiculo = (await db.execute(select(V).where(V.placa.in_(indice_placas.variantes(candidata))))).scalars().first()
+        if veiculo: indice_placas.registrar(veiculo)
+    if veiculo:
         if veiculo.status == "VENDIDO": raise HTTPException(400, detail="Veículo VENDIDO.")
         return veiculo
     
-    for v in db.query(models.Veiculo).all():
-        if limpar_placa(v.placa) in limpar_placa(texto_ocr): 
-             if v.status == "VENDIDO": raise HTTPException(400, detail="Veículo VENDIDO.")
-             return v
-    
     raise HTTPException(status_code=404, detail="Veículo não encontrado")
 
 @app.post("/assistente/ler_km/")
-def assistente_ler_km(arquivo: UploadFile = File(...), db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
-    extensao = arquivo.filename.split(".")[-1]
-    nome = f"temp_km_{uuid.uuid4().hex}.{extensao}"
-    caminho = f"uploads/{nome}"
-    with open(caminho, "wb") as b: shutil.copyfileobj(arquivo.file, b)
-    try: km = ocr_service.ler_km_imagem(caminho)
-    finally: 
-        if os.path.exists(caminho): os.remove(caminho)
+@orcamento_queries.limite(1)
+async def assistente_ler_km(arquivo: UploadFile = File(...), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    with await upload_buffer.receber_async(arquivo) as recebido:
+        km = await ocr_service.ler_km_imagem_async(recebido.abrir(), recebido.sha256)
     if km is None: raise HTTPException(404, detail="KM não encontrado")
     return {"km": km}
 
 # --- ABASTECIMENTOS ---
 @app.post("/abastecimentos/", response_model=schemas.AbastecimentoResponse)
-def registrar_abastecimento(dados: schemas.AbastecimentoCreate, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
-    veiculo = db.query(models.Veiculo).filter(models.Veiculo.id == dados.id_veiculo).first()
+@orcamento_queries.limite(4)
+async def registrar_abastecimento(dados: schemas.AbastecimentoCreate, db: AsyncSession = Depends(get_db_async), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    veiculo = await db.get(models.Veiculo, dados.id_veiculo)
     if not veiculo: raise HTTPException(404, detail="Veículo não encontrado")
     if veiculo.status == "VENDIDO": raise HTTPException(400, detail="BLOQUEADO: Veículo VENDIDO.")
     
-    novo = models.Abastecimento(id_usuario=usuario_atual.id, **dados.dict(), status="PENDENTE_VALIDACAO")
+    # fotos=[] já carregado: sem refresh/lazy load depois do commit (sessão async)
+    novo = models.Abastecimento(id_usuario=usuario_atual.id, **dados.dict(), status="PENDENTE_VALIDACAO", fotos=[])
     db.add(novo)
-    db.commit()
-    db.refresh(novo)
+    await db.run_sync(consumo.registrar, novo) # agregado de consumo na mesma transação
+    await db.commit()
     return novo
 
+def codificar_cursor(data_hora: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{data_hora.isoformat()}|{id}".encode()).decode()
+
+def decodificar_cursor(cursor: str):
+    try:
+        data_txt, id_txt = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(data_txt), int(id_txt)
+    except Exception: raise HTTPException(400, detail="Cursor inválido")
+
+def filtros_abastecimento(
+    status: Optional[str] = None,
+    id_veiculo: Optional[int] = None,
+    id_usuario: Optional[int] = None,
+    id_setor: Optional[int] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+):
+    """Filtros comuns da listagem de abastecimentos (o setor é o do veículo)."""
+    A = models.Abastecimento
+    condicoes = []
+    if status: condicoes.append(A.status == status)
+    if id_veiculo: condicoes.append(A.id_veiculo == id_veiculo)
+    if id_usuario: condicoes.append(A.id_usuario == id_usuario)
+    if id_setor: condicoes.append(A.id_veiculo.in_(select(models.Veiculo.id).where(models.Veiculo.id_setor == id_setor)))
+    if data_inicio: condicoes.append(A.data_hora >= data_inicio)
+    if data_fim: condicoes.append(A.data_hora < data_fim)
+    return condicoes
+
+def pagina_abastecimentos(consulta, condicoes: list, cursor: Optional[str], limite: int):
+    """Aplica filtros + paginação por cursor (keyset) em (data_hora, id), do mais novo para o mais antigo."""
+    A = models.Abastecimento
+    if condicoes: consulta = consulta.where(*condicoes)
+    if cursor:
+        data_cursor, id_cursor = decodificar_cursor(cursor)
+        consulta = consulta.where(or_(A.data_hora < data_cursor, and_(A.data_hora == data_cursor, A.id < id_cursor)))
+    # Busca um registro a mais só para saber se existe próxima página
+    return consulta.order_by(A.data_hora.desc(), A.id.desc()).limit(limite + 1)
+
 @app.get("/abastecimentos/", response_model=list[schemas.AbastecimentoResponse])
-def listar_abastecimentos(db: Session = Depends(get_db)):
-    return db.query(models.Abastecimento).order_by(models.Abastecimento.data_hora.desc()).all()
+@orcamento_queries.limite(2)
+async def listar_abastecimentos(
+    cursor: Optional[str] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    fields: Optional[str] = None,
+    condicoes: list = Depends(filtros_abastecimento),
+    db: AsyncSession = Depends(get_db_leitura_async),
+):
+    # Até 2 queries por página (colunas dos abastecimentos + fotos de todos eles), tudo em tuplas e orjson
+    A, F = models.Abastecimento, models.FotoAbastecimento
+    saida = serializacao.campos(schemas.AbastecimentoResponse, fields)
+    nomes = serializacao.colunas(A, saida, ("id", "data_hora"))
+    linhas = (await db.execute(pagina_abastecimentos(select(*[getattr(A, c) for c in nomes]), condicoes, cursor, limite))).all()
+    itens = serializacao.dicts(linhas[:limite], nomes)
+    cabecalhos = {}
+    if len(linhas) > limite: cabecalhos["X-Proximo-Cursor"] = codificar_cursor(itens[-1]["data_hora"], itens[-1]["id"])
+
+    if "fotos" in saida and itens:
+        campos_foto = list(schemas.FotoResponse.model_fields)
+        fotos = {item["id"]: [] for item in itens}
+        consulta_fotos = select(F.id_abastecimento, *[getattr(F, c) for c in campos_foto]).where(F.id_abastecimento.in_(list(fotos))).order_by(F.id)
+        for id_abastecimento, *valores in await db.execute(consulta_fotos):
+            fotos[id_abastecimento].append(dict(zip(campos_foto, valores)))
+        for item in itens: item["fotos"] = fotos[item["id"]]
+    return serializacao.RespostaJSON(serializacao.projetar(itens, saida), headers=cabecalhos)
+
+COLUNAS_EXPORTACAO = ["id", "data_hora", "id_usuario", "id_veiculo", "valor_total", "litros", "nome_posto",
+                      "quilometragem", "gps_lat", "gps_long", "status", "justificativa_revisao"]
+LOTE_EXPORTACAO = 1000
+
+def _linhas_exportacao(condicoes: list):
+    # Sessão própria: o gerador roda enquanto a resposta é enviada, fora do ciclo do get_db.
+    # Só colunas (sem objetos ORM) + cursor do lado do servidor => memória constante.
+    A = models.Abastecimento
+    consulta = select(*[getattr(A, c) for c in COLUNAS_EXPORTACAO]).where(*condicoes).order_by(A.data_hora.desc(), A.id.desc())
+    db = SessionLeitura()
+    try:
+        resultado = db.execute(consulta.execution_options(stream_results=True, yield_per=LOTE_EXPORTACAO))
+        for lote in resultado.partitions():
+            yield lote
+    finally:
+        db.close()
+
+def _exportar_csv(condicoes: list):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    for lote in _linhas_exportacao(condicoes):
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+def _exportar_ndjson(condicoes: list):
+    # orjson: datas em ISO 8601, igual às respostas JSON da API
+    for lote in _linhas_exportacao(condicoes):
+        yield b"".join(orjson.dumps(dict(zip(COLUNAS_EXPORTACAO, linha))) + b"\n" for linha in lote)
+
+def filtro_area(lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+    """Retângulo via índice de geohash (faixas BETWEEN) + recorte exato nas coordenadas."""
+    A = models.Abastecimento
+    return [or_(*geo.filtro(A.geohash, lat_min, lat_max, lon_min, lon_max)),
+            A.gps_lat.between(lat_min, lat_max), A.gps_long.between(lon_min, lon_max)]
+
+def area_busca(
+    lat_min: float = Query(..., ge=-90, le=90),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lon_min: float = Query(..., ge=-180, le=180),
+    lon_max: float = Query(..., ge=-180, le=180),
+):
+    if lat_min > lat_max or lon_min > lon_max: raise HTTPException(400, detail="Área inválida")
+    return filtro_area(lat_min, lat_max, lon_min, lon_max)
+
+@app.get("/abastecimentos/proximos", response_model=list[schemas.AbastecimentoProximoResponse])
+@orcamento_queries.limite(4)
+async def abastecimentos_proximos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    raio_km: float = Query(..., gt=0),
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    condicoes: list = Depends(filtros_abastecimento),
+    db: AsyncSession = Depends(get_db_leitura_async),
+    usuario_atual: auth.Principal = Depends(get_usuario_atual),
+):
+    if raio_km > GEO_RAIO_MAX_KM: raise HTTPException(400, detail=f"Raio máximo: {GEO_RAIO_MAX_KM} km")
+    A = models.Abastecimento
+    # 1) só id + coordenadas dos candidatos do retângulo; 2) distância exata; 3) carrega os mais próximos
+    candidatos = await db.execute(select(A.id, A.gps_lat, A.gps_long).where(*filtro_area(*geo.caixa_do_raio(lat, lon, raio_km)), *condicoes))
+    distancias = {}
+    for id_abastecimento, gps_lat, gps_long in candidatos:
+        d = geo.haversine_km(lat, lon, gps_lat, gps_long)
+        if d <= raio_km: distancias[id_abastecimento] = d
+    ids = sorted(distancias, key=distancias.get)[:limite]
+    if not ids: return []
+    itens = (await db.execute(select(A).options(selectinload(A.fotos)).where(A.id.in_(ids)))).scalars().all()
+    itens.sort(key=lambda a: distancias[a.id])
+    for a in itens: a.distancia_km = round(distancias[a.id], 3) # atributo só da resposta (não é coluna)
+    return itens
+
+@app.get("/abastecimentos/area", response_model=list[schemas.AbastecimentoResponse])
+@orcamento_queries.limite(3)
+async def abastecimentos_na_area(
+    response: Response,
+    area: list = Depends(area_busca),
+    cursor: Optional[str] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    condicoes: list = Depends(filtros_abastecimento),
+    db: AsyncSession = Depends(get_db_leitura_async),
+    usuario_atual: auth.Principal = Depends(get_usuario_atual),
+):
+    # Mesma paginação da listagem (X-Proximo-Cursor), restrita ao retângulo
+    consulta = select(models.Abastecimento).options(selectinload(models.Abastecimento.fotos))
+    itens = (await db.execute(pagina_abastecimentos(consulta, area + condicoes, cursor, limite))).scalars().all()
+    if len(itens) > limite:
+        itens = itens[:limite]
+        response.headers["X-Proximo-Cursor"] = codificar_cursor(itens[-1].data_hora, itens[-1].id)
+    return itens
+
+@app.get("/postos/", response_model=list[schemas.PostoResponse])
+@orcamento_queries.limite(2)
+async def listar_postos(
+    area: list = Depends(area_busca),
+    precisao: int = Query(7, ge=4, le=geo.GEOHASH_PRECISAO), # 7 ≈ 150 m: o mesmo posto com o nome digitado igual
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    condicoes: list = Depends(filtros_abastecimento),
+    db: AsyncSession = Depends(get_db_leitura_async),
+    usuario_atual: auth.Principal = Depends(get_usuario_atual),
+):
+    # Onde os motoristas abastecem de fato: agrupa por nome do posto + célula de geohash
+    A = models.Abastecimento
+    celula = func.substr(A.geohash, 1, precisao)
+    consulta = (select(A.nome_posto, celula.label("geohash"), func.avg(A.gps_lat).label("gps_lat"), func.avg(A.gps_long).label("gps_long"),
+                       func.count(A.id).label("qtd_abastecimentos"), func.coalesce(func.sum(A.litros), 0).label("total_litros"),
+                       func.coalesce(func.sum(A.valor_total), 0).label("total_valor"), func.max(A.data_hora).label("ultimo_abastecimento"))
+                .where(*area, *condicoes).group_by(A.nome_posto, celula)
+                .order_by(func.count(A.id).desc(), celula).limit(limite))
+    return (await db.execute(consulta)).mappings().all()
+
+@app.get("/abastecimentos/exportar")
+@orcamento_queries.limite(1)
+def exportar_abastecimentos(formato: str = Query("csv", pattern="^(csv|ndjson)$"), condicoes: list = Depends(filtros_abastecimento), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    nome = f"abastecimentos_{datetime.utcnow():%Y%m%d_%H%M%S}.{formato}"
+    cabecalhos = {"Content-Disposition": f'attachment; filename="{nome}"'}
+    if formato == "csv":
+        return StreamingResponse(_exportar_csv(condicoes), media_type="text/csv; charset=utf-8", headers=cabecalhos)
+    return StreamingResponse(_exportar_ndjson(condicoes), media_type="application/x-ndjson", headers=cabecalhos)
 
 @app.patch("/abastecimentos/{id_abastecimento}/revisar", response_model=schemas.AbastecimentoResponse)
-def revisar(id_abastecimento: int, review: schemas.AbastecimentoReview, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(7)
+def revisar(id_abastecimento: int, review: schemas.AbastecimentoReview, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     abastecimento = db.query(models.Abastecimento).filter(models.Abastecimento.id == id_abastecimento).first()
     if not abastecimento: raise HTTPException(404, detail="Não encontrado")
+    status_anterior = abastecimento.status
     abastecimento.status = review.status
     if review.justificativa: abastecimento.justificativa_revisao = review.justificativa
+    if consumo.incluido(status_anterior) != consumo.incluido(review.status):
+        db.flush()
+        consumo.recalcular_veiculo(db, abastecimento.id_veiculo)
     db.commit()
     return abastecimento
 
-@app.post("/abastecimentos/{id_abastecimento}/fotos/")
-def upload_foto(id_abastecimento: int, tipo_foto: str = Form(...), arquivo: UploadFile = File(...), db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
-    abastecimento = db.query(models.Abastecimento).filter(models.Abastecimento.id == id_abastecimento).first()
-    if not abastecimento: raise HTTPException(404, detail="Não encontrado")
-
-    extensao = arquivo.filename.split(".")[-1]
-    nome = f"{id_abastecimento}_{tipo_foto}_{uuid.uuid4().hex}.{extensao}"
-    caminho = f"uploads/{nome}"
-    with open(caminho, "wb") as b: shutil.copyfileobj(arquivo.file, b)
-
-    alerta = ""
+@app.post("/abastecimentos/{id_abastecimento}/fotos/", status_code=status.HTTP_202_ACCEPTED)
+@orcamento_queries.limite(3)
+async def upload_foto(id_abastecimento: int, tipo_foto: str = Form(...), arquivo: UploadFile = File(...), db: AsyncSession = Depends(get_db_async), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    if _estado["storage"]: raise HTTPException(503, detail=f"Envio de fotos indisponível: {_estado['storage']}")
+    if not await db.get(models.Abastecimento, id_abastecimento): raise HTTPException(404, detail="Não encontrado")
+
+    # Só guarda a foto e cria o job; OCR, checagens e upload ficam com a fila (fila_fotos)
+    with await upload_buffer.receber_async(arquivo) as recebido:
+        nome = f"{id_abastecimento}_{tipo_foto}_{uuid.uuid4().hex}.{recebido.extensao}"
+        caminho = fila_fotos.caminho_arquivo(nome)
+        await run_in_threadpool(recebido.salvar, caminho)
     try:
-        if tipo_foto == "PLACA":
-            txt = ocr_service.ler_texto_imagem(caminho)
-            v = db.query(models.Veiculo).filter(models.Veiculo.id == abastecimento.id_veiculo).first()
-            if txt and v.placa.replace("-","") not in txt.replace("-",""): alerta = "Alerta: Placa divergente"
-        elif tipo_foto == "PAINEL":
-            km = ocr_service.ler_km_imagem(caminho)
-            if km and abastecimento.quilometragem and km < abastecimento.quilometragem: alerta = f"Alerta: KM Foto ({km}) < Input ({abastecimento.quilometragem})"
-        
-        if alerta:
-            abastecimento.justificativa_revisao = (abastecimento.justificativa_revisao or "") + " " + alerta
-            db.add(abastecimento)
-
-        with open(caminho, "rb") as f: bytes_arq = f.read()
-        url = storage_client.upload_arquivo(bytes_arq, nome, arquivo.content_type)
-        
-        nova = models.FotoAbastecimento(id_abastecimento=id_abastecimento, tipo=tipo_foto, url_arquivo=url)
-        db.add(nova)
-        db.commit()
-        
+        analise = models.AnaliseFoto(id_abastecimento=id_abastecimento, tipo=tipo_foto, nome_arquivo=nome, content_type=recebido.content_type, sha256=recebido.sha256, status="PENDENTE")
+        db.add(analise)
+        await db.commit()
+    except Exception:
         if os.path.exists(caminho): os.remove(caminho)
-        return {"mensagem": "Sucesso", "url": url, "analise": alerta}
-    except Exception as e:
-        if os.path.exists(caminho): os.remove(caminho)
-        raise HTTPException(500, detail=str(e))
+        raise
+    fila_fotos.enfileirar(analise.id)
+    return {"mensagem": "Recebida", "id_analise": analise.id, "status": analise.status}
+
+@app.get("/abastecimentos/{id_abastecimento}/fotos/", response_model=list[schemas.FotoResponse])
+@orcamento_queries.limite(2)
+def listar_fotos(id_abastecimento: int, db: Session = Depends(get_db_leitura), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    # A tela de revisão carrega url_thumbnail; url_arquivo só ao abrir a foto
+    return db.query(models.FotoAbastecimento).filter(models.FotoAbastecimento.id_abastecimento == id_abastecimento).order_by(models.FotoAbastecimento.id).all()
+
+@app.get("/analises/{id_analise}", response_model=schemas.AnaliseFotoResponse)
+@orcamento_queries.limite(2)
+def consultar_analise(id_analise: int, db: Session = Depends(get_db_leitura), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    analise = db.get(models.AnaliseFoto, id_analise)
+    if not analise: raise HTTPException(404, detail="Não encontrado")
+    return analise
+
+@app.get("/abastecimentos/{id_abastecimento}/analises", response_model=list[schemas.AnaliseFotoResponse])
+@orcamento_queries.limite(2)
+def listar_analises(id_abastecimento: int, db: Session = Depends(get_db_leitura), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    return db.query(models.AnaliseFoto).filter(models.AnaliseFoto.id_abastecimento == id_abastecimento).order_by(models.AnaliseFoto.id).all()
+
+# --- RELATÓRIOS ---
+@app.get("/relatorios/consumo", response_model=list[schemas.ConsumoResponse])
+@orcamento_queries.limite(2)
+def relatorio_consumo(agrupar: str = Query("veiculo", pattern="^(veiculo|setor)$"), id_setor: Optional[int] = None, db: Session = Depends(get_db_leitura), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    # Lê os agregados de consumo_veiculos (mantidos por consumo.py), sem varrer o histórico
+    return consumo.relatorio(db, agrupar, id_setor)
+
+@app.post("/fraude/pontuar", status_code=202)
+@orcamento_queries.limite(1)
+def pontuar_fraude(tarefas: BackgroundTasks, incremental: bool = True, usuario_atual: auth.Principal = Depends(get_usuario_atual)):
+    # Job em lote (pontuacao_fraude.py); o resultado fica em score_fraude/motivos_fraude dos abastecimentos
+    if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Acesso negado")
+    tarefas.add_task(pontuacao_fraude.executar, incremental)
+    return {"mensagem": "Pontuação agendada", "incremental": incremental}
 
 # --- USUÁRIOS (ATUALIZADO) ---
 @app.post("/usuarios/", response_model=schemas.TokenOutput)
-def criar_usuario(novo: schemas.UsuarioCreate, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(4)
+def criar_usuario(novo: schemas.UsuarioCreate, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Acesso negado")
     if db.query(models.Usuario).filter(models.Usuario.email == novo.email).first(): raise HTTPException(400, detail="Email existe")
     
     # Vincula o ID do Setor pelo Nome
-    id_setor_encontrado = None
-    if novo.setor:
-        setor_db = db.query(models.Setor).filter(models.Setor.nome == novo.setor).first()
-        if setor_db: id_setor_encontrado = setor_db.id
+    id_setor_encontrado = cache_setores.id_por_nome(db, novo.setor)
 
     user = models.Usuario(
         nome=novo.nome, 
@@ -254,18 +610,20 @@ def criar_usuario(novo: schemas.UsuarioCreate, db: Session = Depends(get_db), us
     return {"access_token": "", "token_type": "", "perfil": user.perfil}
 
 @app.put("/usuarios/{uid}")
-def atualizar_usuario(uid: int, dados: schemas.UsuarioCreate, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(4)
+def atualizar_usuario(uid: int, dados: schemas.UsuarioCreate, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Acesso negado")
     u = db.query(models.Usuario).filter(models.Usuario.id == uid).first()
     if not u: raise HTTPException(404, detail="Não encontrado")
+    email_antigo = u.email
     
     u.nome = dados.nome
     u.email = dados.email
     u.perfil = dados.perfil
     
     if dados.setor:
-        setor_db = db.query(models.Setor).filter(models.Setor.nome == dados.setor).first()
-        if setor_db: u.id_setor = setor_db.id
+        id_setor = cache_setores.id_por_nome(db, dados.setor)
+        if id_setor: u.id_setor = id_setor
     else:
         u.id_setor = None
 
@@ -273,27 +631,34 @@ def atualizar_usuario(uid: int, dados: schemas.UsuarioCreate, db: Session = Depe
         u.senha_hash = auth.get_password_hash(dados.senha)
         
     db.commit()
+    auth.invalidar_principal(email_antigo, u.email)
     return {"msg": "Atualizado"}
 
-@app.get("/usuarios/")
-def listar_usuarios(db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@app.get("/usuarios/", response_model=list[schemas.UsuarioListaResponse])
+@orcamento_queries.limite(2)
+def listar_usuarios(cursor: Optional[int] = None, limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO), fields: Optional[str] = None, db: Session = Depends(get_db_leitura), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Acesso negado")
     
-    usuarios = db.query(models.Usuario).all()
-    lista = []
-    for u in usuarios:
-        nome_setor = None
-        if u.id_setor:
-            s = db.query(models.Setor).filter(models.Setor.id == u.id_setor).first()
-            if s: nome_setor = s.nome
-        lista.append({"id": u.id, "nome": u.nome, "email": u.email, "perfil": u.perfil, "setor": nome_setor})
-    return lista
+    # Uma query só: usuários + nome do setor via LEFT JOIN, paginado por id
+    U = models.Usuario
+    saida = serializacao.campos(schemas.UsuarioListaResponse, fields)
+    consulta = db.query(U.id, U.nome, U.email, U.perfil, models.Setor.nome).outerjoin(models.Setor, models.Setor.id == U.id_setor)
+    if cursor: consulta = consulta.filter(U.id > cursor)
+    usuarios = serializacao.dicts(consulta.order_by(U.id).limit(limite + 1).all(), ["id", "nome", "email", "perfil", "setor"])
+    cabecalhos = {}
+    if len(usuarios) > limite:
+        usuarios = usuarios[:limite]
+        cabecalhos["X-Proximo-Cursor"] = str(usuarios[-1]["id"])
+    return serializacao.RespostaJSON(serializacao.projetar(usuarios, saida), headers=cabecalhos)
 
 @app.delete("/usuarios/{uid}")
-def deletar_usuario(uid: int, db: Session = Depends(get_db), usuario_atual: models.Usuario = Depends(get_usuario_atual)):
+@orcamento_queries.limite(3)
+def deletar_usuario(uid: int, db: Session = Depends(get_db), usuario_atual: auth.Principal = Depends(get_usuario_atual)):
     if usuario_atual.perfil != "ADMIN": raise HTTPException(403, detail="Acesso negado")
     u = db.query(models.Usuario).filter(models.Usuario.id == uid).first()
     if u: 
+        email = u.email
         db.delete(u)
         db.commit()
+        auth.invalidar_principal(email)
     return {"msg": "Deletado"}
\ No newline at end of file
@@ -0,0 +1,189 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+# Métricas no formato texto do Prometheus, sem dependência externa. Cada série é só um contador
+# em memória (por processo); o /metrics apenas formata o que já está somado, então o scrape é barato.
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_QUANTIDADE = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_registro = []
+
+def _rotulos(nomes, valores):
+    if not nomes: return ""
+    texto = ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for n, v in zip(nomes, valores))
+    return "{" + texto + "}"
+
+class _Metrica:
+    tipo = ""
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._lock = threading.Lock()
+        self._series = {}
+        _registro.append(self)
+
+    def _chave(self, rotulos):
+        return tuple(rotulos.get(n, "") for n in self.rotulos)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock: series = list(self._series.items())
+        for chave, valor in series: linhas += self._linhas(chave, valor)
+        return linhas
+
+class Contador(_Metrica):
+    tipo = "counter"
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock: self._series[chave] = self._series.get(chave, 0) + valor
+
+    def _linhas(self, chave, valor):
+        return [f"{self.nome}{_rotulos(self.rotulos, chave)} {valor}"]
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao # medidor sem rótulos lido na hora do scrape
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock: self._series[chave] = self._series.get(chave, 0) + valor
+
+    def dec(self, valor=1, **rotulos): self.inc(-valor, **rotulos)
+
+    def exportar(self):
+        if self.funcao is not None:
+            with self._lock: self._series[()] = self.funcao()
+        return super().exportar()
+
+    def _linhas(self, chave, valor):
+        return [f"{self.nome}{_rotulos(self.rotulos, chave)} {valor}"]
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None: serie = self._series[chave] = [[0] * len(self.buckets), 0, 0.0] # contagens, total, soma
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += 1
+            serie[2] += valor
+
+    def _linhas(self, chave, serie):
+        contagens, total, soma = serie
+        linhas, acumulado = [], 0
+        for limite, qtd in zip(self.buckets, contagens):
+            acumulado += qtd
+            linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), chave + (limite,))} {acumulado}")
+        linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), chave + ('+Inf',))} {total}")
+        linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {soma}")
+        linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+@contextmanager
+def medir(histograma, erros=None, **rotulos):
+    """Cronometra o bloco; se der exceção, soma 1 em erros (com os mesmos rótulos)."""
+    inicio = time.perf_counter()
+    try: yield
+    except BaseException:
+        if erros is not None: erros.inc(**rotulos)
+        raise
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **rotulos)
+
+def exportar():
+    linhas = []
+    for metrica in _registro: linhas += metrica.exportar()
+    return "\n".join(linhas) + "\n"
+
+# --- HTTP ---
+HTTP_REQUISICOES = Contador("sga_http_requisicoes_total", "Requisições HTTP atendidas", ("metodo", "rota", "status"))
+HTTP_DURACAO = Histograma("sga_http_duracao_segundos", "Latência das requisições HTTP", ("metodo", "rota"))
+HTTP_EM_ANDAMENTO = Medidor("sga_http_em_andamento", "Requisições HTTP em andamento", ("metodo", "rota"))
+
+# --- SQL ---
+SQL_CONSULTAS = Contador("sga_sql_consultas_total", "Comandos SQL executados (inclui as tarefas em segundo plano)")
+SQL_DURACAO = Histograma("sga_sql_duracao_segundos", "Tempo de cada comando SQL")
+SQL_POR_REQUISICAO = Histograma("sga_sql_consultas_por_requisicao", "Comandos SQL por requisição", ("rota",), BUCKETS_QUANTIDADE)
+SQL_TEMPO_POR_REQUISICAO = Histograma("sga_sql_tempo_por_requisicao_segundos", "Tempo total de SQL por requisição", ("rota",))
+
+# --- SERVIÇOS EXTERNOS ---
+OCR_DURACAO = Histograma("sga_ocr_duracao_segundos", "Latência das chamadas ao Google Vision", ("modo",))
+OCR_ERROS = Contador("sga_ocr_erros_total", "Chamadas ao Google Vision que falharam", ("modo",))
+# Taxa de fotos repetidas: acertos / (acertos + faltas)
+OCR_CACHE_CONSULTAS = Contador("sga_ocr_cache_consultas_total", "Consultas ao cache do OCR (resultado = memoria, disco ou falta)", ("resultado",))
+OCR_CACHE_GRAVACOES = Contador("sga_ocr_cache_gravacoes_total", "Resultados do OCR gravados no cache")
+STORAGE_DURACAO = Histograma("sga_storage_duracao_segundos", "Latência dos uploads (com retentativas)", ("backend",))
+STORAGE_ERROS = Contador("sga_storage_erros_total", "Uploads que falharam", ("backend",))
+STORAGE_RETENTATIVAS = Contador("sga_storage_retentativas_total", "Retentativas de upload", ("backend",))
+
+# SQL da requisição atual: [quantidade, segundos]. contextvars seguem a requisição no event loop
+# e no threadpool (o Starlette copia o contexto), então cada requisição soma só as suas queries.
+_sql_requisicao = contextvars.ContextVar("sql_requisicao", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("metricas_inicio")
+    if not inicios: return
+    duracao = time.perf_counter() - inicios.pop()
+    SQL_CONSULTAS.inc()
+    SQL_DURACAO.observar(duracao)
+    acumulado = _sql_requisicao.get()
+    if acumulado is not None:
+        acumulado[0] += 1
+        acumulado[1] += duracao
+
+class MetricasMiddleware:
+    """Middleware ASGI: latência, status, requisições em andamento e SQL por rota.
+
+    A rota é o template ("/veiculos/{veiculo_id}"), não o path, para a cardinalidade ficar fixa.
+    """
+    def __init__(self, app, router):
+        self.app, self.router = app, router
+
+    def _rota(self, scope):
+        parcial = None
+        for rota in self.router.routes:
+            casamento = rota.matches(scope)[0]
+            if casamento == Match.FULL: return rota.path
+            if casamento == Match.PARTIAL and parcial is None: parcial = rota.path # método errado (405)
+        return parcial or "desconhecida"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        metodo, rota, status = scope["method"], self._rota(scope), [500]
+        inicio = time.perf_counter()
+        acumulado = [0, 0.0]
+        token = _sql_requisicao.set(acumulado)
+        HTTP_EM_ANDAMENTO.inc(metodo=metodo, rota=rota)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start": status[0] = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _sql_requisicao.reset(token)
+            HTTP_EM_ANDAMENTO.dec(metodo=metodo, rota=rota)
+            HTTP_REQUISICOES.inc(metodo=metodo, rota=rota, status=status[0])
+            HTTP_DURACAO.observar(time.perf_counter() - inicio, metodo=metodo, rota=rota)
+            SQL_POR_REQUISICAO.observar(acumulado[0], rota=rota)
+            SQL_TEMPO_POR_REQUISICAO.observar(acumulado[1], rota=rota)
@@ -0,0 +1,142 @@
+"""Esquema inicial (substitui atualizar_banco.py e os scripts fix_*.py)
+
+Idempotente: em bancos que já existiam (create_all + scripts) só cria o que falta.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tabelas():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+def _adicionar_colunas(tabela, colunas):
+    existentes = {c["name"] for c in sa.inspect(op.get_bind()).get_columns(tabela)}
+    for coluna in colunas:
+        if coluna.name not in existentes: op.add_column(tabela, coluna)
+
+
+def upgrade():
+    tabelas = _tabelas()
+
+    if "setores" not in tabelas:
+        op.create_table(
+            "setores",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("nome", sa.String, nullable=False, unique=True),
+        )
+        op.create_index("ix_setores_id", "setores", ["id"])
+
+    if "usuarios" not in tabelas:
+        op.create_table(
+            "usuarios",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("nome", sa.String, nullable=False),
+            sa.Column("email", sa.String, nullable=False),
+            sa.Column("senha_hash", sa.String, nullable=False),
+            sa.Column("perfil", sa.String),
+            sa.Column("ativo", sa.Boolean),
+            sa.Column("id_setor", sa.Integer),
+        )
+        op.create_index("ix_usuarios_id", "usuarios", ["id"])
+        op.create_index("ix_usuarios_email", "usuarios", ["email"], unique=True)
+    else:
+        _adicionar_colunas("usuarios", [sa.Column("id_setor", sa.Integer)]) # fix_db.py
+
+    colunas_veiculo = [
+        sa.Column("fabricante", sa.String),
+        sa.Column("ano_fabricacao", sa.Integer),
+        sa.Column("cor", sa.String),
+        sa.Column("chassi", sa.String),
+        sa.Column("id_setor", sa.Integer),
+        sa.Column("status", sa.String, server_default="ESTOQUE"),
+        sa.Column("data_venda", sa.DateTime),
+    ]
+    if "veiculos" not in tabelas:
+        op.create_table(
+            "veiculos",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("placa", sa.String, nullable=False),
+            sa.Column("modelo", sa.String, nullable=False),
+            *colunas_veiculo,
+        )
+        op.create_index("ix_veiculos_id", "veiculos", ["id"])
+        op.create_index("ix_veiculos_placa", "veiculos", ["placa"], unique=True)
+    else:
+        _adicionar_colunas("veiculos", colunas_veiculo) # atualizar_banco.py
+
+    colunas_abastecimento = [
+        sa.Column("justificativa_revisao", sa.String),  # fix_abastecimento.py
+        sa.Column("gps_lat", sa.Float),                 # fix_gps.py
+        sa.Column("gps_long", sa.Float),
+        sa.Column("quilometragem", sa.Integer),         # fix_km.py
+    ]
+    if "abastecimentos" not in tabelas:
+        op.create_table(
+            "abastecimentos",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("id_usuario", sa.Integer, sa.ForeignKey("usuarios.id")),
+            sa.Column("id_veiculo", sa.Integer, sa.ForeignKey("veiculos.id")),
+            sa.Column("data_hora", sa.DateTime),
+            sa.Column("valor_total", sa.Float, nullable=False),
+            sa.Column("litros", sa.Float),
+            sa.Column("nome_posto", sa.String),
+            sa.Column("status", sa.String),
+            *colunas_abastecimento,
+        )
+        op.create_index("ix_abastecimentos_id", "abastecimentos", ["id"])
+    else:
+        _adicionar_colunas("abastecimentos", colunas_abastecimento)
+
+    if "fotos_abastecimento" not in tabelas:
+        op.create_table(
+            "fotos_abastecimento",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("id_abastecimento", sa.Integer, sa.ForeignKey("abastecimentos.id")),
+            sa.Column("tipo", sa.String),
+            sa.Column("url_arquivo", sa.String),
+        )
+        op.create_index("ix_fotos_abastecimento_id", "fotos_abastecimento", ["id"])
+
+    if "analises_foto" not in tabelas:
+        op.create_table(
+            "analises_foto",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("id_abastecimento", sa.Integer, sa.ForeignKey("abastecimentos.id")),
+            sa.Column("tipo", sa.String, nullable=False),
+            sa.Column("nome_arquivo", sa.String, nullable=False),
+            sa.Column("content_type", sa.String),
+            sa.Column("sha256", sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("tentativas", sa.Integer),
+            sa.Column("alerta", sa.String),
+            sa.Column("erro", sa.String),
+            sa.Column("url_arquivo", sa.String),
+            sa.Column("id_foto", sa.Integer, sa.ForeignKey("fotos_abastecimento.id")),
+            sa.Column("criado_em", sa.DateTime),
+            sa.Column("iniciado_em", sa.DateTime),
+            sa.Column("concluido_em", sa.DateTime),
+        )
+        op.create_index("ix_analises_foto_id", "analises_foto", ["id"])
+        op.create_index("ix_analises_foto_id_abastecimento", "analises_foto", ["id_abastecimento"])
+        op.create_index("ix_analises_foto_status", "analises_foto", ["status"])
+
+    if "versoes_recursos" not in tabelas:
+        op.create_table(
+            "versoes_recursos",
+            sa.Column("chave", sa.String, primary_key=True),
+            sa.Column("valor", sa.Integer, nullable=False),
+        )
+
+
+def downgrade():
+    for tabela in ["versoes_recursos", "analises_foto", "fotos_abastecimento", "abastecimentos", "veiculos", "usuarios", "setores"]:
+        op.drop_table(tabela)
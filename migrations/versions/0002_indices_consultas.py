@@ -0,0 +1,52 @@
+"""Índices das consultas quentes + FK de id_setor
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (nome, tabela, colunas) — os mesmos declarados em models.py
+INDICES = [
+    ("ix_abastecimentos_data_hora_id", "abastecimentos", ["data_hora", "id"]),              # listagem/exportação por cursor
+    ("ix_abastecimentos_veiculo_data_hora", "abastecimentos", ["id_veiculo", "data_hora", "id"]),
+    ("ix_abastecimentos_status_data_hora", "abastecimentos", ["status", "data_hora", "id"]), # tela de revisão
+    ("ix_abastecimentos_usuario_data_hora", "abastecimentos", ["id_usuario", "data_hora", "id"]),
+    ("ix_fotos_abastecimento_id_abastecimento", "fotos_abastecimento", ["id_abastecimento"]), # selectinload das fotos
+    ("ix_veiculos_status_data_venda", "veiculos", ["status", "data_venda"]),                 # limpeza dos vendidos
+    ("ix_veiculos_id_setor", "veiculos", ["id_setor"]),
+    ("ix_usuarios_id_setor", "usuarios", ["id_setor"]),
+]
+
+
+def _indices(tabela):
+    return {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(tabela)}
+
+def _tem_fk_setor(tabela):
+    return any(fk["referred_table"] == "setores" for fk in sa.inspect(op.get_bind()).get_foreign_keys(tabela))
+
+
+def upgrade():
+    for tabela in ["usuarios", "veiculos"]:
+        # id_setor apontando para setor apagado vira NULL antes de criar a FK
+        op.execute(f"UPDATE {tabela} SET id_setor = NULL WHERE id_setor IS NOT NULL AND id_setor NOT IN (SELECT id FROM setores)")
+        # SQLite não altera constraints de tabela existente (e não aplica FKs por padrão)
+        if op.get_bind().dialect.name != "sqlite" and not _tem_fk_setor(tabela):
+            op.create_foreign_key(f"fk_{tabela}_id_setor", tabela, "setores", ["id_setor"], ["id"], ondelete="SET NULL")
+
+    for nome, tabela, colunas in INDICES:
+        if nome not in _indices(tabela): op.create_index(nome, tabela, colunas)
+
+
+def downgrade():
+    for nome, tabela, _ in reversed(INDICES):
+        if nome in _indices(tabela): op.drop_index(nome, table_name=tabela)
+    if op.get_bind().dialect.name != "sqlite":
+        for tabela in ["usuarios", "veiculos"]:
+            op.drop_constraint(f"fk_{tabela}_id_setor", tabela, type_="foreignkey")
@@ -0,0 +1,46 @@
+"""Tabela de consumo agregado por veículo (relatório de km/l, R$/km, R$/litro)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "consumo_veiculos" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "consumo_veiculos",
+            sa.Column("id_veiculo", sa.Integer, sa.ForeignKey("veiculos.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("qtd_abastecimentos", sa.Integer, nullable=False),
+            sa.Column("total_litros", sa.Float, nullable=False),
+            sa.Column("total_valor", sa.Float, nullable=False),
+            sa.Column("km_min", sa.Integer),
+            sa.Column("km_max", sa.Integer),
+            sa.Column("litros_km_min", sa.Float),
+            sa.Column("valor_km_min", sa.Float),
+            sa.Column("atualizado_em", sa.DateTime),
+        )
+
+    # Carga inicial a partir do histórico (mesma regra de consumo.reconstruir)
+    op.execute("DELETE FROM consumo_veiculos")
+    op.execute("""
+        INSERT INTO consumo_veiculos (id_veiculo, qtd_abastecimentos, total_litros, total_valor, km_min, km_max, litros_km_min, valor_km_min, atualizado_em)
+        SELECT a.id_veiculo, count(a.id), coalesce(sum(a.litros), 0), coalesce(sum(a.valor_total), 0), min(a.quilometragem), max(a.quilometragem),
+               (SELECT coalesce(a2.litros, 0) FROM abastecimentos a2 WHERE a2.id_veiculo = a.id_veiculo AND a2.status NOT IN ('REPROVADO') AND a2.quilometragem IS NOT NULL ORDER BY a2.quilometragem, a2.id LIMIT 1),
+               (SELECT a2.valor_total FROM abastecimentos a2 WHERE a2.id_veiculo = a.id_veiculo AND a2.status NOT IN ('REPROVADO') AND a2.quilometragem IS NOT NULL ORDER BY a2.quilometragem, a2.id LIMIT 1),
+               CURRENT_TIMESTAMP
+        FROM abastecimentos a
+        WHERE a.status NOT IN ('REPROVADO') AND a.id_veiculo IS NOT NULL
+        GROUP BY a.id_veiculo
+    """)
+
+
+def downgrade():
+    op.drop_table("consumo_veiculos")
@@ -0,0 +1,35 @@
+"""Pontuação de fraude nos abastecimentos + capacidade do tanque
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _colunas(tabela):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(tabela)}
+
+
+def upgrade():
+    if "capacidade_tanque" not in _colunas("veiculos"):
+        op.add_column("veiculos", sa.Column("capacidade_tanque", sa.Float))
+    colunas = _colunas("abastecimentos")
+    if "score_fraude" not in colunas:
+        op.add_column("abastecimentos", sa.Column("score_fraude", sa.Float))
+        op.create_index("ix_abastecimentos_score_fraude", "abastecimentos", ["score_fraude"])
+    if "motivos_fraude" not in colunas:
+        op.add_column("abastecimentos", sa.Column("motivos_fraude", sa.String))
+
+
+def downgrade():
+    op.drop_index("ix_abastecimentos_score_fraude", table_name="abastecimentos")
+    op.drop_column("abastecimentos", "motivos_fraude")
+    op.drop_column("abastecimentos", "score_fraude")
+    op.drop_column("veiculos", "capacidade_tanque")
@@ -0,0 +1,40 @@
+"""Geohash dos abastecimentos (índice espacial para busca por raio/área)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+import geo
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+LOTE = 5000
+
+
+def upgrade():
+    conn = op.get_bind()
+    if "geohash" not in {c["name"] for c in sa.inspect(conn).get_columns("abastecimentos")}:
+        op.add_column("abastecimentos", sa.Column("geohash", sa.String(12)))
+        op.create_index("ix_abastecimentos_geohash", "abastecimentos", ["geohash"])
+
+    # Preenche o histórico em lotes (o cálculo do geohash é em Python, igual ao do models.py)
+    ultimo = 0
+    while True:
+        linhas = conn.execute(sa.text(
+            "SELECT id, gps_lat, gps_long FROM abastecimentos WHERE id > :ultimo AND geohash IS NULL "
+            "AND gps_lat IS NOT NULL AND gps_long IS NOT NULL ORDER BY id LIMIT :lote"), {"ultimo": ultimo, "lote": LOTE}).all()
+        if not linhas: break
+        ultimo = linhas[-1].id
+        dados = [{"id": l.id, "geohash": geo.codificar(l.gps_lat, l.gps_long)} for l in linhas]
+        dados = [d for d in dados if d["geohash"]]
+        if dados: conn.execute(sa.text("UPDATE abastecimentos SET geohash = :geohash WHERE id = :id"), dados)
+
+
+def downgrade():
+    op.drop_index("ix_abastecimentos_geohash", table_name="abastecimentos")
+    op.drop_column("abastecimentos", "geohash")
@@ -0,0 +1,22 @@
+"""Miniatura das fotos dos abastecimentos
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "url_thumbnail" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("fotos_abastecimento")}:
+        op.add_column("fotos_abastecimento", sa.Column("url_thumbnail", sa.String))
+
+
+def downgrade():
+    op.drop_column("fotos_abastecimento", "url_thumbnail")
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Index, event
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
+import geo
 
 # --- TABELA NOVA: SETORES ---
 class Setor(Base):
@@ -17,7 +18,7 @@ class Usuario(Base):
     senha_hash = Column(String, nullable=False)
     perfil = Column(String, default="EXECUTOR") 
     ativo = Column(Boolean, default=True)
-    id_setor = Column(Integer, nullable=True)
+    id_setor = Column(Integer, ForeignKey("setores.id", ondelete="SET NULL"), nullable=True, index=True)
 
 class Veiculo(Base):
     __tablename__ = "veiculos"
@@ -30,12 +31,17 @@ class Veiculo(Base):
     ano_fabricacao = Column(Integer, nullable=True)
     cor = Column(String, nullable=True)
     chassi = Column(String, nullable=True)
-    id_setor = Column(Integer, nullable=True)
+    id_setor = Column(Integer, ForeignKey("setores.id", ondelete="SET NULL"), nullable=True, index=True)
+    capacidade_tanque = Column(Float, nullable=True) # litros
     
     # LÓGICA DE VENDAS
     status = Column(String, default="ESTOQUE") 
     data_venda = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_veiculos_status_data_venda", "status", "data_venda"),
+    )
+
 class Abastecimento(Base):
     __tablename__ = "abastecimentos"
     id = Column(Integer, primary_key=True, index=True)
@@ -49,16 +55,74 @@ class Abastecimento(Base):
     justificativa_revisao = Column(String, nullable=True)
     gps_lat = Column(Float, nullable=True)
     gps_long = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True, index=True) # derivado de gps_lat/gps_long (busca por raio/área)
     quilometragem = Column(Integer, nullable=True)
+
+    # Pontuação do job de fraude (pontuacao_fraude.py); NULL = ainda não avaliado
+    score_fraude = Column(Float, nullable=True, index=True)
+    motivos_fraude = Column(String, nullable=True)
     
     usuario = relationship("Usuario")
     veiculo = relationship("Veiculo")
     fotos = relationship("FotoAbastecimento", back_populates="abastecimento")
 
+    # Índices das consultas mais usadas (listagem paginada por (data_hora, id) e seus filtros)
+    __table_args__ = (
+        Index("ix_abastecimentos_data_hora_id", "data_hora", "id"),
+        Index("ix_abastecimentos_veiculo_data_hora", "id_veiculo", "data_hora", "id"),
+        Index("ix_abastecimentos_status_data_hora", "status", "data_hora", "id"),
+        Index("ix_abastecimentos_usuario_data_hora", "id_usuario", "data_hora", "id"),
+    )
+
+@event.listens_for(Abastecimento, "before_insert")
+@event.listens_for(Abastecimento, "before_update")
+def _atualizar_geohash(mapper, connection, abastecimento):
+    abastecimento.geohash = geo.codificar(abastecimento.gps_lat, abastecimento.gps_long)
+
 class FotoAbastecimento(Base):
     __tablename__ = "fotos_abastecimento"
     id = Column(Integer, primary_key=True, index=True)
-    id_abastecimento = Column(Integer, ForeignKey("abastecimentos.id"))
+    id_abastecimento = Column(Integer, ForeignKey("abastecimentos.id"), index=True)
     tipo = Column(String) 
     url_arquivo = Column(String) 
-    abastecimento = relationship("Abastecimento", back_populates="fotos")
\ No newline at end of file
+    url_thumbnail = Column(String, nullable=True) # miniatura para as telas de revisão
+    abastecimento = relationship("Abastecimento", back_populates="fotos")
+
+# --- FILA DE ANÁLISE DAS FOTOS ---
+class AnaliseFoto(Base):
+    __tablename__ = "analises_foto"
+    id = Column(Integer, primary_key=True, index=True)
+    id_abastecimento = Column(Integer, ForeignKey("abastecimentos.id"), index=True)
+    tipo = Column(String, nullable=False)
+    nome_arquivo = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    sha256 = Column(String, nullable=True)
+    status = Column(String, default="PENDENTE", index=True) # PENDENTE, PROCESSANDO, CONCLUIDA, ERRO
+    tentativas = Column(Integer, default=0)
+    alerta = Column(String, nullable=True)
+    erro = Column(String, nullable=True)
+    url_arquivo = Column(String, nullable=True)
+    id_foto = Column(Integer, ForeignKey("fotos_abastecimento.id"), nullable=True)
+    criado_em = Column(DateTime, default=datetime.datetime.utcnow)
+    iniciado_em = Column(DateTime, nullable=True)
+    concluido_em = Column(DateTime, nullable=True)
+
+# --- VERSÕES DOS DADOS DE REFERÊNCIA (invalidação de caches) ---
+class VersaoRecurso(Base):
+    __tablename__ = "versoes_recursos"
+    chave = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+# --- CONSUMO AGREGADO POR VEÍCULO (atualizado a cada abastecimento/revisão, ver consumo.py) ---
+class ConsumoVeiculo(Base):
+    __tablename__ = "consumo_veiculos"
+    id_veiculo = Column(Integer, ForeignKey("veiculos.id", ondelete="CASCADE"), primary_key=True)
+    qtd_abastecimentos = Column(Integer, nullable=False, default=0)
+    total_litros = Column(Float, nullable=False, default=0)
+    total_valor = Column(Float, nullable=False, default=0)
+    km_min = Column(Integer, nullable=True)
+    km_max = Column(Integer, nullable=True)
+    # Litros/valor do abastecimento de menor KM: foram gastos antes do trecho medido, não entram no km/l
+    litros_km_min = Column(Float, nullable=True)
+    valor_km_min = Column(Float, nullable=True)
+    atualizado_em = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
\ No newline at end of file
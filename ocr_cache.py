@@ -0,0 +1,78 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import metricas
+
+# Cache do resultado do OCR pelo hash (SHA-256) dos bytes da imagem.
+# Nível 1: LRU em memória. Nível 2 (opcional): arquivos em OCR_CACHE_DIR com validade OCR_CACHE_TTL.
+OCR_CACHE_MAX = int(os.getenv("OCR_CACHE_MAX", "2048"))                 # itens em memória (0 = desligado)
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")                              # vazio = sem cache em disco
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", str(7 * 24 * 3600)))   # segundos, só para o disco
+
+_lock = threading.Lock()
+_memoria = OrderedDict()
+
+def chave(conteudo):
+    """SHA-256 dos bytes ou de um arquivo aberto (lido em blocos)."""
+    if not hasattr(conteudo, "read"): return hashlib.sha256(conteudo).hexdigest()
+    conteudo.seek(0)
+    hasher = hashlib.sha256()
+    for bloco in iter(lambda: conteudo.read(1024 * 1024), b""): hasher.update(bloco)
+    return hasher.hexdigest()
+
+def _caminho(hash_conteudo):
+    return os.path.join(OCR_CACHE_DIR, hash_conteudo[:2], f"{hash_conteudo}.txt")
+
+def _guardar_memoria(hash_conteudo, texto):
+    if OCR_CACHE_MAX <= 0: return
+    with _lock:
+        _memoria[hash_conteudo] = texto
+        _memoria.move_to_end(hash_conteudo)
+        while len(_memoria) > OCR_CACHE_MAX: _memoria.popitem(last=False)
+
+def obter(hash_conteudo):
+    """Retorna o texto em cache ou None."""
+    with _lock:
+        texto = _memoria.get(hash_conteudo)
+        if texto is not None:
+            _memoria.move_to_end(hash_conteudo)
+            metricas.OCR_CACHE_CONSULTAS.inc(resultado="memoria")
+            return texto
+
+    if OCR_CACHE_DIR:
+        caminho = _caminho(hash_conteudo)
+        try:
+            if time.time() - os.path.getmtime(caminho) <= OCR_CACHE_TTL:
+                with open(caminho, encoding="utf-8") as f: texto = f.read()
+                _guardar_memoria(hash_conteudo, texto)
+                metricas.OCR_CACHE_CONSULTAS.inc(resultado="disco")
+                return texto
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    metricas.OCR_CACHE_CONSULTAS.inc(resultado="falta")
+    return None
+
+def guardar(hash_conteudo, texto):
+    """Guarda um resultado válido do OCR (None = erro, não vai para o cache)."""
+    if texto is None: return
+    _guardar_memoria(hash_conteudo, texto)
+    if OCR_CACHE_DIR:
+        caminho = _caminho(hash_conteudo)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f"{caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f: f.write(texto)
+            os.replace(temporario, caminho) # gravação atômica
+        except OSError as e:
+            print(f"Erro cache OCR: {e}")
+    metricas.OCR_CACHE_GRAVACOES.inc()
+
+def itens_memoria():
+    return len(_memoria)
+
+def limpar():
+    with _lock: _memoria.clear()
@@ -2,40 +2,202 @@ import requests
 import base64
 import os
 import re # Biblioteca para expressões regulares (achar números)
+import time
+import asyncio
+import threading
+import httpx
+import ocr_cache
+import imagens
+import metricas
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def ler_texto_imagem(caminho_arquivo):
-    api_key = os.getenv("GOOGLE_API_KEY") 
+# Configuração do cliente do Google Vision (a URL pode apontar para um servidor falso local nos testes)
+VISION_API_URL = os.getenv("VISION_API_URL", "https://vision.googleapis.com/v1/images:annotate")
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "10"))              # segundos por tentativa
+OCR_TENTATIVAS = int(os.getenv("OCR_TENTATIVAS", "3"))
+OCR_BACKOFF = float(os.getenv("OCR_BACKOFF", "0.5"))              # 0.5s, 1s, 2s...
+OCR_POOL = int(os.getenv("OCR_POOL", "20"))                       # conexões mantidas abertas
+OCR_LOTE_MAX = int(os.getenv("OCR_LOTE_MAX", "16"))               # o Vision aceita até 16 imagens por chamada
+OCR_LOTE_JANELA_MS = float(os.getenv("OCR_LOTE_JANELA_MS", "0"))  # 0 = micro-lotes desligados
+STATUS_RETENTAVEIS = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_sessao = None
+
+def _sessao_http():
+    """Sessão requests com pool de conexões e retry com backoff (criada no primeiro uso)."""
+    global _sessao
+    if _sessao is None:
+        with _lock:
+            if _sessao is None:
+                retry = Retry(total=OCR_TENTATIVAS - 1, backoff_factor=OCR_BACKOFF, status_forcelist=STATUS_RETENTAVEIS, allowed_methods=None, raise_on_status=False)
+                sessao = requests.Session()
+                sessao.mount("https://", HTTPAdapter(pool_connections=OCR_POOL, pool_maxsize=OCR_POOL, max_retries=retry))
+                sessao.mount("http://", HTTPAdapter(pool_connections=OCR_POOL, pool_maxsize=OCR_POOL, max_retries=retry))
+                _sessao = sessao
+    return _sessao
+
+def _url():
+    api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key: return None
+    return f"{VISION_API_URL}?key={api_key}"
+
+def _bytes(imagem):
+    """Aceita o caminho do arquivo, os bytes da imagem ou um arquivo aberto (que não é lido inteiro aqui)."""
+    if isinstance(imagem, (bytes, bytearray, memoryview)) or hasattr(imagem, "read"): return imagem
+    with open(imagem, "rb") as image_file: return image_file.read()
+
+def _conteudo(dados):
+    return base64.b64encode(dados).decode("utf-8")
+
+def _payload(conteudos):
+    return {"requests": [{"image": {"content": c}, "features": [{"type": "TEXT_DETECTION"}]} for c in conteudos]}
+
+def _extrair_texto(resp):
+    if "fullTextAnnotation" in resp:
+        texto = resp["fullTextAnnotation"]["text"]
+        return texto.upper().replace("-", "").replace(" ", "")
+    return ""
+
+class ErroVision(Exception):
+    pass
 
-    url = f"https://vision.googleapis.com/v1/images:annotate?key={api_key}"
+def _extrair_textos(dados, quantidade):
+    """Texto de cada imagem. Um "error" da imagem vira ErroVision na posição dela (não texto vazio)."""
+    # Sem "responses" não é "imagem sem texto": é erro (e não pode ir para o ocr_cache)
+    if "responses" not in dados: raise ErroVision(f"Resposta do Vision sem 'responses': {str(dados)[:200]}")
+    respostas = dados["responses"] or []
+    textos = []
+    for i in range(quantidade):
+        resp = respostas[i] if i < len(respostas) else {}
+        erro = resp.get("error")
+        textos.append(ErroVision(f"Vision: {erro.get('message', erro) if isinstance(erro, dict) else erro}") if erro else _extrair_texto(resp))
+    return textos
+
+def _texto(valor, modo=None):
+    """Desembrulha o resultado de uma imagem. modo: conta o erro (quando não está dentro de um metricas.medir)."""
+    if isinstance(valor, Exception):
+        if modo: metricas.OCR_ERROS.inc(modo=modo)
+        raise valor
+    return valor
+
+def ler_texto_imagem(imagem, hash_conteudo=None):
+    """hash_conteudo: SHA-256 dos bytes, se quem chama já calculou (chave do cache)."""
+    url = _url()
+    if not url: return None
 
     try:
-        with open(caminho_arquivo, "rb") as image_file:
-            content = base64.b64encode(image_file.read()).decode("utf-8")
-
-        payload = {
-            "requests": [{
-                "image": {"content": content},
-                "features": [{"type": "TEXT_DETECTION"}]
-            }]
-        }
-
-        response = requests.post(url, json=payload)
-        dados = response.json()
-        
-        if "responses" in dados and len(dados["responses"]) > 0:
-            resp = dados["responses"][0]
-            if "fullTextAnnotation" in resp:
-                texto = resp["fullTextAnnotation"]["text"]
-                return texto.upper().replace("-", "").replace(" ", "")
-        return ""
+        dados = _bytes(imagem)
+        hash_conteudo = hash_conteudo or ocr_cache.chave(dados)
+        texto = ocr_cache.obter(hash_conteudo)
+        if texto is not None: return texto
+
+        # Manda a versão reduzida (a chave do cache continua sendo o hash do original)
+        conteudo = _conteudo(imagens.reduzir(dados))
+        with metricas.medir(metricas.OCR_DURACAO, metricas.OCR_ERROS, modo="sync"):
+            response = _sessao_http().post(url, json=_payload([conteudo]), timeout=OCR_TIMEOUT)
+            response.raise_for_status() # 4xx, ou 5xx depois das retentativas: falha, não "sem texto"
+            texto = _texto(_extrair_textos(response.json(), 1)[0])
+        ocr_cache.guardar(hash_conteudo, texto)
+        return texto
+    except Exception as e:
+        print(f"Erro OCR: {e}")
+        return None
+
+# --- API ASSÍNCRONA ---
+_clientes_async = {}
+
+def _cliente_async():
+    # Um AsyncClient por event loop (httpx não compartilha conexões entre loops)
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None:
+        limites = httpx.Limits(max_connections=OCR_POOL, max_keepalive_connections=OCR_POOL)
+        cliente = httpx.AsyncClient(timeout=OCR_TIMEOUT, limits=limites)
+        _clientes_async[loop] = cliente
+    return cliente
+
+async def _anotar_async(url, conteudos):
+    """Uma chamada images:annotate com retry e backoff exponencial."""
+    with metricas.medir(metricas.OCR_DURACAO, metricas.OCR_ERROS, modo="async"):
+        return await _anotar_async_tentativas(url, conteudos)
+
+async def _anotar_async_tentativas(url, conteudos):
+    for tentativa in range(OCR_TENTATIVAS):
+        try:
+            response = await _cliente_async().post(url, json=_payload(conteudos))
+            if response.status_code not in STATUS_RETENTAVEIS:
+                response.raise_for_status()
+                return _extrair_textos(response.json(), len(conteudos))
+        except httpx.TransportError:
+            if tentativa == OCR_TENTATIVAS - 1: raise
+        if tentativa < OCR_TENTATIVAS - 1: await asyncio.sleep(OCR_BACKOFF * (2 ** tentativa))
+    raise Exception(f"Vision indisponível (HTTP {response.status_code})")
+
+class _LoteVision:
+    """Junta imagens pedidas ao mesmo tempo em uma única chamada images:annotate."""
+    def __init__(self):
+        self.pendentes = []
+        self.agendado = None
+
+    async def ler(self, url, conteudo):
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes.append((conteudo, futuro))
+        if len(self.pendentes) >= OCR_LOTE_MAX: self._disparar(url)
+        elif self.agendado is None: self.agendado = asyncio.get_running_loop().call_later(OCR_LOTE_JANELA_MS / 1000, self._disparar, url)
+        return await futuro
+
+    def _disparar(self, url):
+        if self.agendado is not None:
+            self.agendado.cancel()
+            self.agendado = None
+        lote, self.pendentes = self.pendentes[:OCR_LOTE_MAX], self.pendentes[OCR_LOTE_MAX:]
+        if lote: asyncio.ensure_future(self._enviar(url, lote))
+        if self.pendentes: self.agendado = asyncio.get_running_loop().call_later(OCR_LOTE_JANELA_MS / 1000, self._disparar, url)
+
+    async def _enviar(self, url, lote):
+        try:
+            textos = await _anotar_async(url, [c for c, _ in lote])
+            for (_, futuro), texto in zip(lote, textos):
+                if futuro.done(): continue
+                # Erro de uma imagem falha só quem pediu aquela imagem
+                if isinstance(texto, Exception):
+                    metricas.OCR_ERROS.inc(modo="async")
+                    futuro.set_exception(texto)
+                else: futuro.set_result(texto)
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done(): futuro.set_exception(e)
+
+_lotes = {}
+
+async def ler_texto_imagem_async(imagem, hash_conteudo=None):
+    url = _url()
+    if not url: return None
+
+    try:
+        dados = _bytes(imagem)
+        hash_conteudo = hash_conteudo or ocr_cache.chave(dados)
+        texto = ocr_cache.obter(hash_conteudo)
+        if texto is not None: return texto
+
+        conteudo = _conteudo(await asyncio.to_thread(imagens.reduzir, dados)) # decodificar/reduzir é CPU: fora do event loop
+        if OCR_LOTE_JANELA_MS > 0:
+            loop = asyncio.get_running_loop()
+            lote = _lotes.get(loop)
+            if lote is None: lote = _lotes[loop] = _LoteVision()
+            texto = await lote.ler(url, conteudo)
+        else:
+            texto = _texto((await _anotar_async(url, [conteudo]))[0], modo="async")
+        ocr_cache.guardar(hash_conteudo, texto)
+        return texto
     except Exception as e:
         print(f"Erro OCR: {e}")
         return None
 
 # --- NOVA FUNÇÃO ESPECIALIZADA EM NÚMEROS ---
-def ler_km_imagem(caminho_arquivo):
-    texto_bruto = ler_texto_imagem(caminho_arquivo)
+def extrair_km(texto_bruto):
     if not texto_bruto:
         return None
     
@@ -51,6 +213,12 @@ def ler_km_imagem(caminho_arquivo):
     
     return None
 
+def ler_km_imagem(imagem, hash_conteudo=None):
+    return extrair_km(ler_texto_imagem(imagem, hash_conteudo))
+
+async def ler_km_imagem_async(imagem, hash_conteudo=None):
+    return extrair_km(await ler_texto_imagem_async(imagem, hash_conteudo))
+
     # 2. LÓGICA DE IA 🤖
     if tipo_foto == "PLACA":
         # ... (Lógica da Placa que já existia) ...
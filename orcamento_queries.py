@@ -0,0 +1,114 @@
+import os
+import re
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import orjson
+
+# Orçamento de queries por rota (dev e CI). Cada rota declara quantos comandos SQL pode fazer
+# (@orcamento_queries.limite(n)); com o modo ligado, o SQL de cada requisição é contado pelos
+# eventos do engine e comandos repetidos que só mudam os parâmetros (o N+1 clássico) são apontados.
+#   off  = nada é registrado (produção)
+#   log  = só avisa no console e manda X-Query-Count
+#   erro = a requisição que estourar vira 500 (para o verificar_orcamentos.py / CI)
+QUERY_ORCAMENTO_MODO = os.getenv("QUERY_ORCAMENTO_MODO", "off").lower()
+QUERY_REPETIDA_MAX = int(os.getenv("QUERY_REPETIDA_MAX", "3"))  # mesmo comando mais que isso = N+1
+
+# IN (?, ?, ?) com tamanhos diferentes conta como o mesmo comando
+_LISTA_PARAMETROS = re.compile(r"\((?:\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)\s*,)*\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)\s*\)")
+
+def normalizar(sql):
+    return _LISTA_PARAMETROS.sub("(?)", " ".join(sql.split()))
+
+def limite(max_queries, motivo=None):
+    """Declara o máximo de comandos SQL da rota (use logo abaixo do @app.get/post...).
+
+    Rotas em massa, cujo custo cresce com a entrada, usam limite(None, motivo="...") e ficam
+    fora da contagem e da checagem de N+1 (o motivo fica registrado na própria rota).
+    """
+    if max_queries is None and not motivo: raise ValueError("limite(None) precisa de um motivo")
+    def decorar(funcao):
+        funcao.max_queries = max_queries
+        funcao.sem_orcamento = motivo if max_queries is None else None
+        return funcao
+    return decorar
+
+class Registro:
+    """SQL de uma requisição (ou de um bloco com contar())."""
+    def __init__(self):
+        self.comandos = Counter()
+
+    @property
+    def total(self):
+        return sum(self.comandos.values())
+
+    def repetidos(self):
+        return [(sql, n) for sql, n in self.comandos.most_common() if n > QUERY_REPETIDA_MAX]
+
+    def problemas(self, max_queries=None):
+        encontrados = []
+        if max_queries is not None and self.total > max_queries:
+            encontrados.append(f"{self.total} queries (orçamento: {max_queries})")
+        for sql, n in self.repetidos():
+            encontrados.append(f"{n}x o mesmo comando (possível N+1): {sql[:160]}")
+        return encontrados
+
+_atual = contextvars.ContextVar("orcamento_queries", default=None)
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    registro = _atual.get()
+    if registro is not None: registro.comandos[normalizar(statement)] += 1
+
+def ativar():
+    if not event.contains(Engine, "after_cursor_execute", _depois_sql):
+        event.listen(Engine, "after_cursor_execute", _depois_sql)
+
+@contextmanager
+def contar():
+    """Conta o SQL do bloco (jobs, scripts): with contar() as r: ...; r.total"""
+    ativar()
+    registro = Registro()
+    token = _atual.set(registro)
+    try: yield registro
+    finally: _atual.reset(token)
+
+class OrcamentoMiddleware:
+    """Middleware ASGI: conta o SQL até a resposta começar e compara com o limite da rota.
+
+    O endpoint só é conhecido depois do roteamento (scope["endpoint"]), por isso a checagem
+    é feita no http.response.start. Queries de StreamingResponse/BackgroundTasks ficam de fora.
+    """
+    def __init__(self, app, modo=QUERY_ORCAMENTO_MODO):
+        self.app, self.modo = app, modo
+        if modo != "off": ativar()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.modo == "off": return await self.app(scope, receive, send)
+        registro = Registro()
+        token = _atual.set(registro)
+        bloqueada = [False]
+
+        async def enviar(mensagem):
+            if bloqueada[0]: return
+            if mensagem["type"] == "http.response.start":
+                endpoint = scope.get("endpoint")
+                problemas = [] if getattr(endpoint, "sem_orcamento", None) else registro.problemas(getattr(endpoint, "max_queries", None))
+                if problemas:
+                    print(f"⚠️ Orçamento de queries: {scope['method']} {scope['path']}: " + " | ".join(problemas))
+                if problemas and self.modo == "erro":
+                    bloqueada[0] = True
+                    corpo = orjson.dumps({"detail": "Orçamento de queries estourado", "problemas": problemas})
+                    await send({"type": "http.response.start", "status": 500, "headers": [
+                        (b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode()),
+                        (b"x-query-count", str(registro.total).encode())]})
+                    await send({"type": "http.response.body", "body": corpo})
+                    return
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [(b"x-query-count", str(registro.total).encode())]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _atual.reset(token)
@@ -0,0 +1,182 @@
+# pontuacao_fraude.py
+"""Pontuação de fraude em lote sobre o histórico de abastecimentos.
+
+Lê as colunas necessárias em blocos de veículos (ordenados por veículo e data), calcula os indícios com NumPy
+comparando cada registro com os anteriores do mesmo veículo (o KM contra o maior KM já lido) e grava
+score_fraude/motivos_fraude só nas linhas que mudaram. Registros sem data_hora vão para o fim do veículo
+e ficam fora das comparações com o histórico (só os indícios da própria linha valem para eles).
+
+Uso:
+    python pontuacao_fraude.py               # reavalia todo o histórico
+    python pontuacao_fraude.py --incremental # só veículos com registros ainda não avaliados
+"""
+import os
+import argparse
+import threading
+import numpy as np
+from sqlalchemy import select, update, func, case, bindparam, values, column, Integer, Float, String
+from database import SessionLocal
+import models
+
+FRAUDE_LOTE = int(os.getenv("FRAUDE_LOTE", "50000"))                      # linhas por bloco
+TANQUE_PADRAO_LITROS = float(os.getenv("TANQUE_PADRAO_LITROS", "80"))     # quando o veículo não tem capacidade_tanque
+FRAUDE_VELOCIDADE_MAX = float(os.getenv("FRAUDE_VELOCIDADE_MAX", "150"))  # km/h entre dois abastecimentos
+FRAUDE_PRECO_Z_MAX = float(os.getenv("FRAUDE_PRECO_Z_MAX", "3.5"))        # z-score robusto (mediana/MAD) do R$/litro
+FOLGA_TANQUE = 1.05
+LOTE_GRAVACAO = 5000
+MAX_VEICULOS_FAIXA = 1000
+
+# (código do motivo, peso no score)
+INDICIOS = [
+    ("KM_REGREDIU", 0.5),
+    ("LITROS_ACIMA_TANQUE", 0.3),
+    ("PRECO_ATIPICO", 0.2),
+    ("DESLOCAMENTO_IMPOSSIVEL", 0.4),
+]
+
+A, V = models.Abastecimento, models.Veiculo
+COLUNAS = [A.id, A.id_veiculo, A.data_hora, A.quilometragem, A.litros, A.valor_total, A.gps_lat, A.gps_long, A.score_fraude, A.motivos_fraude, V.capacidade_tanque]
+
+def _float(valores):
+    return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+
+def _colunar(linhas):
+    """Lista de tuplas -> dicionário de arrays NumPy (None vira NaN; data_hora vira segundos, NaN se nula)."""
+    ids, veiculos, datas, km, litros, valor, lat, lon, score, motivos, capacidade = zip(*linhas)
+    datas = np.array(datas, dtype="datetime64[s]")
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "veiculo": np.array(veiculos, dtype=np.int64),
+        "t": np.where(np.isnat(datas), np.nan, datas.astype(np.int64).astype(np.float64)), # NaT.astype(float) não é NaN
+        "km": _float(km), "litros": _float(litros), "valor": _float(valor),
+        "lat": _float(lat), "lon": _float(lon), "capacidade": _float(capacidade),
+        "score": _float(score), "motivos": list(motivos),
+    }
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+def _anterior(x):
+    return np.concatenate(([np.nan], x[:-1]))
+
+def _maximo_anterior(x, inicio):
+    """Maior valor válido (não NaN) antes de cada linha no mesmo veículo, ou NaN se não houver.
+
+    inicio marca a primeira linha de cada veículo. Cada veículo é deslocado para uma faixa acima da do
+    anterior, então um único np.fmax.accumulate (que ignora NaN) vale como máximo acumulado por veículo.
+    """
+    validos = x[~np.isnan(x)]
+    if not len(validos): return np.full(len(x), np.nan)
+    base, largura = validos.min(), validos.max() - validos.min() + 1
+    deslocamento = np.cumsum(inicio) * largura
+    anterior = _anterior(np.fmax.accumulate(x - base + deslocamento)) - deslocamento
+    return np.where(anterior >= 0, anterior + base, np.nan) # < 0: veio de outro veículo (ou não há anterior)
+
+def referencia_preco(db):
+    """Mediana e MAD do R$/litro de todo o histórico (uma coluna só)."""
+    precos = np.fromiter((p for (p,) in db.execute(select(A.valor_total / A.litros).where(A.litros > 0).execution_options(yield_per=FRAUDE_LOTE))), dtype=np.float64)
+    if not len(precos): return None, None
+    mediana = float(np.median(precos))
+    return mediana, float(np.median(np.abs(precos - mediana))) or None
+
+def calcular(c, mediana=None, mad=None):
+    """Recebe um bloco colunar ordenado por (veículo, data) e devolve (scores, matriz de indícios)."""
+    mesmo_veiculo = np.concatenate(([False], c["veiculo"][1:] == c["veiculo"][:-1]))
+    com_data = ~np.isnan(c["t"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # KM sem data não tem posição no histórico: nem entra no máximo nem é comparado
+        km = np.where(com_data, c["km"], np.nan)
+        km_regrediu = km < _maximo_anterior(km, ~mesmo_veiculo)
+
+        capacidade = np.where(np.isnan(c["capacidade"]), TANQUE_PADRAO_LITROS, c["capacidade"])
+        litros_acima = c["litros"] > capacidade * FOLGA_TANQUE
+
+        preco_atipico = np.zeros(len(c["id"]), dtype=bool)
+        if mediana is not None and mad:
+            preco = np.where(c["litros"] > 0, c["valor"] / c["litros"], np.nan)
+            preco_atipico = np.abs(0.6745 * (preco - mediana) / mad) > FRAUDE_PRECO_Z_MAX
+
+        distancia = _haversine_km(_anterior(c["lat"]), _anterior(c["lon"]), c["lat"], c["lon"])
+        horas = np.maximum((c["t"] - _anterior(c["t"])) / 3600.0, 1 / 60) # mínimo de 1 minuto
+        deslocamento_impossivel = mesmo_veiculo & (distancia / horas > FRAUDE_VELOCIDADE_MAX)
+
+    indicios = np.column_stack([km_regrediu, litros_acima, preco_atipico, deslocamento_impossivel])
+    pesos = np.array([peso for _, peso in INDICIOS])
+    return np.round(np.minimum(indicios @ pesos, 1.0), 4), indicios
+
+def _motivos(indicios):
+    motivos = [None] * len(indicios)
+    for i in np.flatnonzero(indicios.any(axis=1)):
+        motivos[i] = ";".join(codigo for (codigo, _), marcado in zip(INDICIOS, indicios[i]) if marcado)
+    return motivos
+
+def _gravar(db, ids, scores, motivos):
+    if not ids: return
+    if db.get_bind().dialect.name == "postgresql":
+        # UPDATE ... FROM (VALUES ...): um comando por lote em vez de um por linha
+        for i in range(0, len(ids), LOTE_GRAVACAO):
+            dados = values(column("id", Integer), column("score", Float), column("motivos", String), name="novos").data(
+                list(zip(ids[i:i + LOTE_GRAVACAO], scores[i:i + LOTE_GRAVACAO], motivos[i:i + LOTE_GRAVACAO])))
+            db.execute(update(A).where(A.id == dados.c.id).values(score_fraude=dados.c.score, motivos_fraude=dados.c.motivos))
+    else:
+        stmt = update(A.__table__).where(A.__table__.c.id == bindparam("b_id")).values(score_fraude=bindparam("b_score"), motivos_fraude=bindparam("b_motivos"))
+        db.execute(stmt, [{"b_id": i, "b_score": s, "b_motivos": m} for i, s, m in zip(ids, scores, motivos)])
+
+def _processar_bloco(db, linhas, mediana, mad):
+    c = _colunar(linhas)
+    scores, indicios = calcular(c, mediana, mad)
+    motivos = _motivos(indicios)
+    mudou = np.flatnonzero(np.isnan(c["score"]) | (np.abs(c["score"] - scores) > 1e-9) | np.array([m != a for m, a in zip(motivos, c["motivos"])]))
+    _gravar(db, c["id"][mudou].tolist(), scores[mudou].tolist(), [motivos[i] for i in mudou])
+    return len(mudou)
+
+def _faixas(db, incremental):
+    """Agrupa veículos consecutivos em faixas de ~FRAUDE_LOTE abastecimentos (um veículo nunca fica dividido)."""
+    consulta = select(A.id_veiculo, func.count()).where(A.id_veiculo.is_not(None)).group_by(A.id_veiculo).order_by(A.id_veiculo)
+    if incremental:
+        consulta = consulta.having(func.sum(case((A.score_fraude.is_(None), 1), else_=0)) > 0)
+    faixa, total = [], 0
+    for id_veiculo, qtd in db.execute(consulta):
+        faixa.append(id_veiculo)
+        total += qtd
+        if total >= FRAUDE_LOTE or len(faixa) >= MAX_VEICULOS_FAIXA: # limita também o IN (...) do modo incremental
+            yield faixa
+            faixa, total = [], 0
+    if faixa: yield faixa
+
+def pontuar(db, incremental=False):
+    """Reavalia o histórico (ou só os veículos com registros novos). Retorna (linhas lidas, linhas gravadas)."""
+    mediana, mad = referencia_preco(db)
+    lidas = gravadas = 0
+    for veiculos in list(_faixas(db, incremental)):
+        filtro = A.id_veiculo.in_(veiculos) if incremental else A.id_veiculo.between(veiculos[0], veiculos[-1])
+        linhas = db.execute(select(*COLUNAS).outerjoin(V, V.id == A.id_veiculo).where(filtro).order_by(A.id_veiculo, A.data_hora.is_(None), A.data_hora, A.id)).all()
+        if not linhas: continue
+        gravadas += _processar_bloco(db, linhas, mediana, mad)
+        lidas += len(linhas)
+        db.commit()
+    return lidas, gravadas
+
+_execucao = threading.Lock()
+
+def executar(incremental=False):
+    """Roda a pontuação numa sessão própria (CLI e BackgroundTasks). Retorna False se já houver uma em andamento."""
+    if not _execucao.acquire(blocking=False): return False
+    db = SessionLocal()
+    try:
+        lidas, gravadas = pontuar(db, incremental)
+        print(f"✅ Fraude: {lidas} abastecimentos avaliados, {gravadas} atualizados")
+    except Exception as e:
+        print(f"❌ Erro na pontuação de fraude: {e}")
+    finally:
+        db.close()
+        _execucao.release()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incremental", action="store_true")
+    args = parser.parse_args()
+    executar(args.incremental)
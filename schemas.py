@@ -29,6 +29,13 @@ class UsuarioCreate(BaseModel):
     cargo: Optional[str] = None
     setor: Optional[str] = None
 
+class UsuarioListaResponse(BaseModel):
+    id: int
+    nome: str
+    email: str
+    perfil: str
+    setor: Optional[str] = None
+
 # --- VEÍCULOS ---
 class VeiculoBase(BaseModel):
     placa: str
@@ -38,6 +45,7 @@ class VeiculoBase(BaseModel):
     ano_fabricacao: Optional[int] = None
     chassi: Optional[str] = None
     id_setor: Optional[int] = None
+    capacidade_tanque: Optional[float] = None
     status: str = "ESTOQUE"
 
 class VeiculoCreate(VeiculoBase):
@@ -50,6 +58,7 @@ class VeiculoUpdate(BaseModel):
     status: Optional[str] = None
     id_setor: Optional[int] = None
     chassi: Optional[str] = None
+    capacidade_tanque: Optional[float] = None
 
 class VeiculoResponse(VeiculoBase):
     id: int
@@ -74,6 +83,7 @@ class FotoResponse(BaseModel):
     id: int
     tipo: str
     url_arquivo: str
+    url_thumbnail: Optional[str] = None
     class Config:
         orm_mode = True
 
@@ -83,6 +93,48 @@ class AbastecimentoResponse(AbastecimentoCreate):
     data_hora: datetime
     status: str
     justificativa_revisao: Optional[str] = None
+    score_fraude: Optional[float] = None
+    motivos_fraude: Optional[str] = None
     fotos: List[FotoResponse] = []
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AbastecimentoProximoResponse(AbastecimentoResponse):
+    distancia_km: float
+
+class PostoResponse(BaseModel):
+    nome_posto: Optional[str] = None
+    geohash: str
+    gps_lat: float
+    gps_long: float
+    qtd_abastecimentos: int
+    total_litros: float
+    total_valor: float
+    ultimo_abastecimento: Optional[datetime] = None
+
+class AnaliseFotoResponse(BaseModel):
+    id: int
+    id_abastecimento: int
+    tipo: str
+    status: str
+    tentativas: int
+    alerta: Optional[str] = None
+    erro: Optional[str] = None
+    url_arquivo: Optional[str] = None
+    criado_em: datetime
+    concluido_em: Optional[datetime] = None
+    class Config:
+        orm_mode = True
+
+# --- RELATÓRIOS ---
+class ConsumoResponse(BaseModel):
+    id_veiculo: Optional[int] = None
+    placa: Optional[str] = None
+    id_setor: Optional[int] = None
+    qtd_abastecimentos: int
+    total_litros: float
+    total_valor: float
+    km_rodados: Optional[int] = None
+    km_por_litro: Optional[float] = None
+    custo_por_km: Optional[float] = None
+    preco_por_litro: Optional[float] = None
\ No newline at end of file
@@ -1,5 +1,5 @@
-from database import SessionLocal, engine
-from models import Base, Veiculo
+from database import SessionLocal
+import importacao_veiculos
 
 def criar_frota_inicial():
     db = SessionLocal()
@@ -15,23 +15,11 @@ def criar_frota_inicial():
 
     print("🚀 Iniciando cadastro da frota...")
 
-    for carro in frota:
-        # Verifica se já existe para não duplicar
-        existe = db.query(Veiculo).filter(Veiculo.placa == carro["placa"]).first()
-        if not existe:
-            novo = Veiculo(
-                placa=carro["placa"],
-                modelo=carro["modelo"],
-                cor=carro["cor"],
-                ano_fabricacao=carro["ano_fabricacao"],
-                status="PATIO"
-            )
-            db.add(novo)
-            print(f"✅ Criado: {carro['modelo']} ({carro['placa']})")
-        else:
-            print(f"⚠️ Já existe: {carro['placa']}")
+    # Mesmo caminho da importação em CSV: placas existentes são ignoradas numa consulta só
+    resultado = importacao_veiculos.importar(db, [{**carro, "status": "PATIO"} for carro in frota])
+    for erro in resultado["erros"]: print(f"⚠️ {erro['erro']}: {erro['placa']}")
+    print(f"✅ Criados: {resultado['inseridos']}")
 
-    db.commit()
     db.close()
     print("🏁 Frota cadastrada com sucesso!")
 
@@ -0,0 +1,36 @@
+import orjson
+from fastapi import HTTPException, Response
+
+# Caminho rápido das listagens grandes: a rota seleciona só as colunas (tuplas, sem objetos ORM),
+# monta dicts na mesma ordem de campos do schema de resposta e codifica com orjson, sem criar
+# um modelo Pydantic por linha. O formato do JSON é o mesmo do response_model.
+
+class RespostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, conteudo) -> bytes:
+        return orjson.dumps(conteudo)
+
+def campos(modelo, fields=None):
+    """Campos do schema a devolver (todos, ou a projeção pedida em ?fields=a,b), na ordem do schema."""
+    todos = list(modelo.model_fields)
+    if not fields: return todos
+    pedidos = {f.strip() for f in fields.split(",") if f.strip()}
+    invalidos = pedidos - set(todos)
+    if invalidos: raise HTTPException(400, detail=f"Campos inválidos: {', '.join(sorted(invalidos))}")
+    return [c for c in todos if c in pedidos]
+
+def colunas(modelo_orm, saida, auxiliares=()):
+    """Nomes a selecionar: os campos pedidos que são colunas + os auxiliares (id do cursor etc.)."""
+    nomes = [c for c in saida if c in modelo_orm.__table__.columns]
+    return nomes + [c for c in auxiliares if c not in nomes]
+
+def dicts(linhas, nomes):
+    return [dict(zip(nomes, linha)) for linha in linhas]
+
+def projetar(itens, saida):
+    """Mantém só os campos pedidos, na ordem do schema (igual ao que o response_model geraria)."""
+    return [{c: item.get(c) for c in saida} for item in itens]
+
+def dumps(conteudo) -> bytes:
+    return orjson.dumps(conteudo)
@@ -1,42 +1,138 @@
 import os
-from supabase import create_client, Client
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import httpx
 from dotenv import load_dotenv
+import metricas
 
 load_dotenv()
 
-# Pegando as credenciais das variáveis de ambiente
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
+# Onde as fotos ficam: "supabase" (Storage REST) ou "local" (pasta servida em /fotos, para dev e testes).
+# Sem STORAGE_BACKEND, usa o Supabase se SUPABASE_URL/SUPABASE_KEY estiverem configurados; o local só
+# com STORAGE_BACKEND=local explícito (em produção, credencial faltando é erro, não foto gravada no disco;
+# a API sobe mesmo assim, só com o envio de fotos desligado).
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "sga-fotos")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND") or ("supabase" if SUPABASE_URL and SUPABASE_KEY else None)
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "uploads")
+STORAGE_LOCAL_URL = os.getenv("STORAGE_LOCAL_URL", "/fotos")
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "30"))       # segundos por tentativa
+STORAGE_TENTATIVAS = int(os.getenv("STORAGE_TENTATIVAS", "3"))
+STORAGE_BACKOFF = float(os.getenv("STORAGE_BACKOFF", "0.5"))       # 0.5s, 1s, 2s...
+STORAGE_POOL = int(os.getenv("STORAGE_POOL", "20"))                # conexões mantidas abertas
+STORAGE_PARALELO = int(os.getenv("STORAGE_PARALELO", "4"))         # uploads simultâneos em upload_varios
+STATUS_RETENTAVEIS = (429, 500, 502, 503, 504)
 
-# Validação simples para não quebrar se esquecer a env
-if not url or not key:
-    print("⚠️ AVISO: SUPABASE_URL ou SUPABASE_KEY não configurados!")
-    supabase = None
-else:
-    supabase: Client = create_client(url, key)
+class ErroStorage(Exception):
+    pass
 
-def upload_arquivo(arquivo_bytes, nome_arquivo, content_type="image/jpeg"):
-    """
-    Sobe o arquivo para o bucket 'sga-fotos' e retorna a URL Pública.
+class ArmazenamentoLocal:
+    """Grava na pasta servida pelo StaticFiles em /fotos."""
+    def __init__(self, pasta=STORAGE_LOCAL_DIR, url_base=STORAGE_LOCAL_URL):
+        self.pasta, self.url_base = pasta, url_base.rstrip("/")
+
+    def url_publica(self, nome_arquivo):
+        return f"{self.url_base}/{quote(nome_arquivo)}"
+
+    def enviar(self, conteudo, nome_arquivo, content_type="image/jpeg"):
+        caminho = os.path.join(self.pasta, nome_arquivo)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(f"{caminho}.tmp", "wb") as f: f.write(conteudo)
+        os.replace(f"{caminho}.tmp", caminho)
+        return self.url_publica(nome_arquivo)
+
+class ArmazenamentoSupabase:
+    """Supabase Storage pela API REST, com conexões reaproveitadas e retry com backoff.
+
+    A URL pública do bucket é montada localmente (sem a chamada extra de get_public_url).
     """
-    if not supabase:
-        raise Exception("Supabase não configurado.")
+    def __init__(self, url, key, bucket=SUPABASE_BUCKET):
+        self.base = f"{url.rstrip('/')}/storage/v1"
+        self.bucket = bucket
+        self.headers = {"Authorization": f"Bearer {key}", "apikey": key}
+        self._lock = threading.Lock()
+        self._cliente = None
+
+    def url_publica(self, nome_arquivo):
+        return f"{self.base}/object/public/{self.bucket}/{quote(nome_arquivo)}"
+
+    def _destino(self, nome_arquivo):
+        return f"{self.base}/object/{self.bucket}/{quote(nome_arquivo)}"
+
+    def _limites(self):
+        return httpx.Limits(max_connections=STORAGE_POOL, max_keepalive_connections=STORAGE_POOL)
+
+    def _http(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = httpx.Client(headers=self.headers, timeout=STORAGE_TIMEOUT, limits=self._limites())
+        return self._cliente
 
-    bucket_name = "sga-fotos"
-    
+    @staticmethod
+    def _cabecalhos(content_type):
+        # x-upsert: repetir um upload (retry, job reprocessado) não falha com "já existe"
+        return {"Content-Type": content_type or "application/octet-stream", "x-upsert": "true"}
+
+    def enviar(self, conteudo, nome_arquivo, content_type="image/jpeg"):
+        for tentativa in range(STORAGE_TENTATIVAS):
+            ultima = tentativa == STORAGE_TENTATIVAS - 1
+            try:
+                resposta = self._http().post(self._destino(nome_arquivo), content=conteudo, headers=self._cabecalhos(content_type))
+                if resposta.status_code < 300: return self.url_publica(nome_arquivo)
+                if resposta.status_code not in STATUS_RETENTAVEIS or ultima:
+                    raise ErroStorage(f"Upload de {nome_arquivo} falhou (HTTP {resposta.status_code}): {resposta.text[:200]}")
+            except httpx.TransportError as e:
+                if ultima: raise ErroStorage(f"Upload de {nome_arquivo} falhou: {e}") from e
+            metricas.STORAGE_RETENTATIVAS.inc(backend="supabase")
+            time.sleep(STORAGE_BACKOFF * (2 ** tentativa))
+
+_lock = threading.Lock()
+_backend = None
+_executor = None
+
+def backend():
+    """Backend configurado (criado no primeiro uso, não no import)."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                if STORAGE_BACKEND is None:
+                    raise ErroStorage("Storage não configurado: defina SUPABASE_URL/SUPABASE_KEY ou STORAGE_BACKEND=local.")
+                if STORAGE_BACKEND == "supabase":
+                    if not SUPABASE_URL or not SUPABASE_KEY: raise ErroStorage("Supabase não configurado.")
+                    _backend = ArmazenamentoSupabase(SUPABASE_URL, SUPABASE_KEY)
+                elif STORAGE_BACKEND == "local":
+                    _backend = ArmazenamentoLocal()
+                else:
+                    raise ErroStorage(f"STORAGE_BACKEND desconhecido: {STORAGE_BACKEND}")
+    return _backend
+
+def url_publica(nome_arquivo):
+    return backend().url_publica(nome_arquivo)
+
+def upload_arquivo(arquivo_bytes, nome_arquivo, content_type="image/jpeg"):
+    """Sobe o arquivo e retorna a URL pública."""
     try:
-        # Faz o upload
-        # file_options define o tipo do arquivo (opcional, mas bom pra navegador)
-        res = supabase.storage.from_(bucket_name).upload(
-            path=nome_arquivo,
-            file=arquivo_bytes,
-            file_options={"content-type": content_type}
-        )
-        
-        # Gera a URL pública para salvar no banco
-        public_url = supabase.storage.from_(bucket_name).get_public_url(nome_arquivo)
-        return public_url
-        
+        with metricas.medir(metricas.STORAGE_DURACAO, metricas.STORAGE_ERROS, backend=STORAGE_BACKEND or "nenhum"):
+            return backend().enviar(arquivo_bytes, nome_arquivo, content_type)
     except Exception as e:
-        print(f"❌ Erro no Upload Supabase: {e}")
-        raise e
\ No newline at end of file
+        print(f"❌ Erro no Upload ({STORAGE_BACKEND}): {e}")
+        raise
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None: _executor = ThreadPoolExecutor(max_workers=STORAGE_PARALELO, thread_name_prefix="storage")
+    return _executor
+
+def upload_varios(arquivos):
+    """arquivos: [(bytes, nome, content_type)]. Sobe em paralelo e retorna as URLs na mesma ordem."""
+    if len(arquivos) <= 1: return [upload_arquivo(*a) for a in arquivos]
+    futuros = [_pool().submit(upload_arquivo, *a) for a in arquivos]
+    return [f.result() for f in futuros]
+
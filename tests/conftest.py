@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Antes de importar o app: banco SQLite descartável, storage local e nada de serviço externo
+_PASTA = tempfile.mkdtemp(prefix="sga_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_PASTA, 'sga.db')}"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["STORAGE_LOCAL_DIR"] = os.path.join(_PASTA, "fotos")
+os.environ["FILA_DIR"] = os.path.join(_PASTA, "fila")
+os.environ["GOOGLE_API_KEY"] = ""
+os.environ["QUERY_ORCAMENTO_MODO"] = "off"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import models
+import auth
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    db.add(models.Usuario(nome="Admin", email="admin@sga.com", senha_hash=auth.get_password_hash("admin123"), perfil="ADMIN"))
+    db.commit()
+    db.close()
+    return main.app
+
+@pytest.fixture(scope="session")
+def cliente(app):
+    from fastapi.testclient import TestClient
+    # Um event loop só para a sessão inteira (o pool assíncrono fica preso ao loop)
+    with TestClient(app) as c:
+        token = c.post("/auth/login", data={"username": "admin@sga.com", "password": "admin123"}).json()["access_token"]
+        c.headers["Authorization"] = f"Bearer {token}"
+        yield c
+
+@pytest.fixture
+def db(app):
+    sessao = database.SessionLocal()
+    yield sessao
+    sessao.close()
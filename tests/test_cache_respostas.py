@@ -0,0 +1,28 @@
+import pytest
+import cache_respostas
+
+@pytest.mark.parametrize("cabecalho, esperado", [
+    ('"setores-3-abc"', True),
+    ('W/"setores-3-abc"', True),
+    ('"outro", W/"setores-3-abc" , "mais"', True),
+    ("*", True),
+    ('"setores-3-abcdef"', False),      # o ETag é um prefixo deste
+    ('"x-setores-3-abc"', False),       # ... ou um trecho
+    ('"setores-3-abc"x', False),
+    ("", False),
+])
+def test_if_none_match_compara_cada_tag_exata(cabecalho, esperado):
+    assert cache_respostas.confere('"setores-3-abc"', cabecalho) is esperado
+
+def test_304_e_invalidacao_depois_de_uma_escrita(cliente):
+    primeira = cliente.get("/setores/")
+    etag = primeira.headers["ETag"]
+    revalidada = cliente.get("/setores/", headers={"If-None-Match": etag})
+    assert revalidada.status_code == 304
+    assert revalidada.headers["ETag"] == etag
+
+    assert cliente.post("/setores/", json={"nome": "Setor ETag"}).status_code == 200  # incrementa a versão "setores"
+    depois = cliente.get("/setores/", headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != etag
+    assert "Setor ETag" in [s["nome"] for s in depois.json()]
@@ -0,0 +1,24 @@
+import models
+import versoes
+import cache_setores
+import orcamento_queries
+
+def test_setor_criado_por_outro_worker_e_encontrado(db):
+    cache_setores.listar(db)  # mapa carregado antes do setor existir
+    setor = models.Setor(nome="Setor Outro Worker")
+    db.add(setor)
+    db.commit()  # sem versoes.incrementar: o mapa deste processo continua velho
+    assert cache_setores.id_por_nome(db, "Setor Outro Worker") == setor.id
+    assert cache_setores.nome_por_id(db, setor.id) == "Setor Outro Worker"
+
+def test_lote_confere_as_faltas_num_comando_so(db, monkeypatch):
+    monkeypatch.setattr(versoes, "VERSAO_TTL", 3600)  # a versão não é relida no meio da contagem
+    db.add(models.Setor(nome="Setor Lote"))
+    db.commit()
+    cache_setores.listar(db)
+    with orcamento_queries.contar() as registro:
+        ids = cache_setores.ids_por_nomes(db, ["Setor Lote"] + [f"Inexistente {i}" for i in range(50)])
+        nomes = cache_setores.nomes_por_ids(db, range(100000, 100050))
+    assert list(ids) == ["Setor Lote"]
+    assert nomes == {}
+    assert registro.total == 2
@@ -0,0 +1,32 @@
+import models
+import consumo
+
+def _abastecer(db, veiculo, litros, valor, km):
+    a = models.Abastecimento(id_veiculo=veiculo.id, litros=litros, valor_total=valor, quilometragem=km, status="APROVADO")
+    db.add(a)
+    db.flush()
+    consumo.registrar(db, a)
+
+def test_relatorio_por_setor_ignora_veiculo_sem_km(db):
+    setor = models.Setor(nome="Setor Consumo")
+    db.add(setor)
+    db.flush()
+    com_km = models.Veiculo(placa="CON0001", modelo="Com KM", id_setor=setor.id)
+    sem_km = models.Veiculo(placa="CON0002", modelo="Sem KM", id_setor=setor.id)
+    db.add_all([com_km, sem_km])
+    db.flush()
+    _abastecer(db, com_km, 40, 240, 10000)
+    _abastecer(db, com_km, 50, 300, 10500)  # 500 km com 50 L (o tanque do 1º abastecimento não conta)
+    _abastecer(db, sem_km, 30, 180, None)
+    _abastecer(db, sem_km, 35, 210, None)
+    db.commit()
+
+    veiculos = {v["placa"]: v for v in consumo.relatorio(db, id_setor=setor.id)}
+    assert veiculos["CON0001"]["km_por_litro"] == 10.0
+    assert veiculos["CON0002"]["km_por_litro"] is None
+
+    [linha] = consumo.relatorio(db, agrupar="setor", id_setor=setor.id)
+    assert linha["total_litros"] == 155
+    assert linha["km_rodados"] == 500
+    assert linha["km_por_litro"] == 10.0
+    assert linha["custo_por_km"] == 0.6
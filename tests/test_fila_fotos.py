@@ -0,0 +1,12 @@
+import os
+import pytest
+import fila_fotos
+
+def test_fila_dentro_da_pasta_publica_nao_inicia(tmp_path, monkeypatch):
+    monkeypatch.setattr(fila_fotos, "FILA_DIR", os.path.join(tmp_path, "uploads", "fila"))
+    with pytest.raises(RuntimeError):
+        fila_fotos.iniciar(os.path.join(tmp_path, "uploads"))
+
+def test_fila_padrao_fora_da_pasta_publica(app):
+    import main
+    assert not fila_fotos._dentro(fila_fotos.FILA_DIR, main.PASTA_FOTOS)
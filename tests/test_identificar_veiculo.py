@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+import database
+import models
+import versoes
+import ocr_service
+
+FOTO = {"arquivo": ("placa.jpg", b"\xff\xd8\xff", "image/jpeg")}
+
+@pytest.fixture
+def ocr(monkeypatch):
+    lido = {}
+    async def ler(conteudo, sha256=None): return lido["texto"]
+    monkeypatch.setattr(ocr_service, "ler_texto_imagem_async", ler)
+    return lido
+
+@pytest.fixture
+def comandos():
+    registrados = []
+    def antes(conn, cursor, statement, parameters, context, executemany): registrados.append(statement)
+    motor = database.async_engine_leitura.sync_engine
+    event.listen(motor, "before_cursor_execute", antes)
+    yield registrados
+    event.remove(motor, "before_cursor_execute", antes)
+
+def _veiculo(db, placa, status="ESTOQUE", versionar=True):
+    veiculo = models.Veiculo(placa=placa, modelo="Teste", status=status)
+    db.add(veiculo)
+    if versionar: versoes.incrementar(db, "veiculos")
+    db.commit()
+    return veiculo
+
+def test_vendido_respondido_pelo_indice_sem_ler_o_veiculo(cliente, db, ocr, comandos):
+    _veiculo(db, "IDV1A23", "VENDIDO")
+    ocr["texto"] = "BRASIL IDV1A23"
+    assert cliente.post("/identificar_veiculo/", files=FOTO).status_code == 400  # carrega o índice
+    comandos.clear()
+    resposta = cliente.post("/identificar_veiculo/", files=FOTO)
+    assert resposta.status_code == 400
+    assert not [c for c in comandos if "FROM veiculos" in c]
+
+def test_venda_em_outro_worker_recarrega_o_indice(cliente, db, ocr, monkeypatch):
+    veiculo = _veiculo(db, "IDV2B34")
+    ocr["texto"] = "IDV2B34"
+    assert cliente.post("/identificar_veiculo/", files=FOTO).json()["placa"] == "IDV2B34"
+    # Outro processo vende o veículo: só a versão "veiculos" avisa este processo
+    veiculo.status = "VENDIDO"
+    versoes.incrementar(db, "veiculos")
+    db.commit()
+    monkeypatch.setattr(versoes, "_locais", {})
+    assert cliente.post("/identificar_veiculo/", files=FOTO).status_code == 400
+
+def test_placa_fora_do_indice_e_buscada_no_banco(cliente, db, ocr):
+    ocr["texto"] = "IDV3C45"
+    assert cliente.post("/identificar_veiculo/", files=FOTO).status_code == 404
+    _veiculo(db, "IDV-3C45", versionar=False)  # o índice deste processo não fica sabendo
+    assert cliente.post("/identificar_veiculo/", files=FOTO).json()["placa"] == "IDV-3C45"
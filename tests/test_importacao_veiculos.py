@@ -0,0 +1,30 @@
+import io
+import models
+import versoes
+import importacao_veiculos
+import orcamento_queries
+
+def _csv(linhas):
+    return importacao_veiculos.ler_csv(io.BytesIO("\n".join(["placa;modelo;setor;id_setor"] + linhas).encode()))
+
+def test_setor_errado_nao_vira_uma_query_por_linha(db, monkeypatch):
+    monkeypatch.setattr(versoes, "VERSAO_TTL", 3600)
+    monkeypatch.setattr(importacao_veiculos, "IMPORTACAO_LOTE", 100)
+    db.add(models.Setor(nome="Setor Importação"))
+    db.commit()
+    linhas = [f"IMS{i:04d};Modelo;{'Setr Importação' if i % 2 else 'Setor Importação'};" for i in range(300)]
+    linhas += [f"IMI{i:04d};Modelo;;99999" for i in range(50)]
+    with orcamento_queries.contar() as registro:
+        relatorio = importacao_veiculos.importar(db, _csv(linhas))
+    assert relatorio["inseridos"] == 150
+    assert relatorio["qtd_erros"] == 200
+    assert {e["erro"] for e in relatorio["erros"]} == {"Setor não encontrado: Setr Importação", "Setor não encontrado: 99999"}
+    assert max(registro.comandos.values()) <= 4  # 350 linhas = 4 lotes: no máximo um comando igual por lote
+    assert registro.total < 30
+
+def test_csv_quebrado_no_meio_devolve_o_que_entrou(db, monkeypatch):
+    monkeypatch.setattr(importacao_veiculos, "IMPORTACAO_LOTE", 100)
+    bruto = "\n".join(["placa;modelo"] + [f"UTF{i:04d};Modelo" for i in range(2500)]).encode() + b"\nBAD0001;\xff\n"
+    relatorio = importacao_veiculos.importar(db, importacao_veiculos.ler_csv(io.BytesIO(bruto)))
+    assert relatorio["inseridos"] == db.query(models.Veiculo).filter(models.Veiculo.placa.like("UTF%")).count() > 0
+    assert relatorio["erros"][-1]["erro"] == "O CSV deve estar em UTF-8 (importação interrompida)"
@@ -0,0 +1,20 @@
+import ocr_cache
+
+def _valores(cliente):
+    linhas = [l for l in cliente.get("/metrics").text.splitlines() if l.startswith("sga_ocr_cache")]
+    return {nome: float(valor) for nome, valor in (l.rsplit(" ", 1) for l in linhas)}
+
+def test_consultas_ao_cache_aparecem_no_metrics(cliente):
+    antes = _valores(cliente)
+    hash_conteudo = ocr_cache.chave(b"foto repetida")
+    assert ocr_cache.obter(hash_conteudo) is None
+    ocr_cache.guardar(hash_conteudo, "ABC1234")
+    ocr_cache.guardar(ocr_cache.chave(b"erro"), None)  # erro do Vision não é gravado
+    assert ocr_cache.obter(hash_conteudo) == "ABC1234"
+    depois = _valores(cliente)
+
+    def diferenca(nome): return depois.get(nome, 0) - antes.get(nome, 0)
+    assert diferenca('sga_ocr_cache_consultas_total{resultado="falta"}') == 1
+    assert diferenca('sga_ocr_cache_consultas_total{resultado="memoria"}') == 1
+    assert diferenca("sga_ocr_cache_gravacoes_total") == 1
+    assert diferenca("sga_ocr_cache_itens_memoria") == 1
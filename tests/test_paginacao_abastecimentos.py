@@ -0,0 +1,53 @@
+import base64
+import itertools
+from datetime import datetime, timedelta
+import pytest
+import models
+
+_placas = itertools.count(1)
+
+@pytest.fixture
+def veiculo_com_historico(db):
+    veiculo = models.Veiculo(placa=f"PAG{next(_placas):04d}", modelo="Paginação")
+    db.add(veiculo)
+    db.flush()
+    inicio = datetime(2026, 3, 1, 8, 0)
+    # 5 horários com 5 abastecimentos cada: as páginas de 4 cortam os empates no meio
+    db.add_all([models.Abastecimento(id_veiculo=veiculo.id, data_hora=inicio + timedelta(hours=h), litros=40, valor_total=240)
+                for h in range(5) for _ in range(5)])
+    db.commit()
+    return veiculo.id
+
+def _pagina(cliente, id_veiculo, cursor=None):
+    params = {"id_veiculo": id_veiculo, "limite": 4, "fields": "id,data_hora"}
+    if cursor: params["cursor"] = cursor
+    resposta = cliente.get("/abastecimentos/", params=params)
+    assert resposta.status_code == 200
+    return resposta.json(), resposta.headers.get("X-Proximo-Cursor")
+
+def _esperado(db, id_veiculo):
+    A = models.Abastecimento
+    return [id for (id,) in db.query(A.id).filter(A.id_veiculo == id_veiculo).order_by(A.data_hora.desc(), A.id.desc())]
+
+def test_cursor_percorre_tudo_uma_vez_com_empates(cliente, db, veiculo_com_historico):
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        itens, cursor = _pagina(cliente, veiculo_com_historico, cursor)
+        vistos += [item["id"] for item in itens]
+        paginas += 1
+        if not cursor: break
+    assert paginas == 7  # 25 registros, 4 por página
+    assert vistos == _esperado(db, veiculo_com_historico)  # mesma ordem (data_hora desc, id desc), sem repetir nem pular
+
+def test_cursor_de_registro_apagado_continua_de_onde_parou(cliente, db, veiculo_com_historico):
+    itens, cursor = _pagina(cliente, veiculo_com_historico)
+    db.query(models.Abastecimento).filter(models.Abastecimento.id == itens[-1]["id"]).delete()
+    db.commit()
+    seguinte, _ = _pagina(cliente, veiculo_com_historico, cursor)
+    assert [item["id"] for item in seguinte] == _esperado(db, veiculo_com_historico)[3:7]
+
+@pytest.mark.parametrize("cursor", ["nao-e-base64!", base64.urlsafe_b64encode(b"ontem|abc").decode(), base64.urlsafe_b64encode(b"sem separador").decode()])
+def test_cursor_invalido_responde_400(cliente, cursor):
+    resposta = cliente.get("/abastecimentos/", params={"cursor": cursor})
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == "Cursor inválido"
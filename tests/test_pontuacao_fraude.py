@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+import numpy as np
+import models
+import pontuacao_fraude
+
+INICIO = datetime(2026, 1, 1)
+
+def _linha(id, veiculo, horas, km):
+    data = None if horas is None else INICIO + timedelta(hours=horas)
+    return (id, veiculo, data, km, 40.0, 240.0, None, None, None, None, 60.0)
+
+def _km_regrediu(linhas):
+    _, indicios = pontuacao_fraude.calcular(pontuacao_fraude._colunar(linhas))
+    return indicios[:, 0].tolist()
+
+def test_km_comparado_com_o_maior_km_anterior():
+    assert _km_regrediu([
+        _linha(1, 1, 0, 1000), _linha(2, 1, 24, 1200), _linha(3, 1, 48, 1100), _linha(4, 1, 72, 1150), _linha(5, 1, 96, 1300),
+        _linha(6, 2, 0, 500),  # outro veículo: não compara com o 1
+    ]) == [False, False, True, True, False, False]
+
+def test_km_ausente_nao_esconde_a_regressao():
+    assert _km_regrediu([_linha(1, 1, 0, 1000), _linha(2, 1, 24, None), _linha(3, 1, 48, 900)]) == [False, False, True]
+
+def test_registro_sem_data_fica_fora_das_comparacoes():
+    linhas = [_linha(1, 1, 0, 1000), _linha(2, 1, 24, 1100), _linha(3, 1, None, 10), _linha(4, 2, 0, 50)]
+    c = pontuacao_fraude._colunar(linhas)
+    assert np.isnan(c["t"][2])  # NaT não vira um número gigante negativo
+    assert _km_regrediu(linhas) == [False, False, False, False]
+
+def test_pontuar_ordena_sem_data_no_fim(db):
+    veiculo = models.Veiculo(placa="FRD0001", modelo="Fraude")
+    db.add(veiculo)
+    db.flush()
+    db.add_all([models.Abastecimento(id_veiculo=veiculo.id, data_hora=None, quilometragem=5, litros=40, valor_total=240),
+                models.Abastecimento(id_veiculo=veiculo.id, data_hora=INICIO, quilometragem=1000, litros=40, valor_total=240),
+                models.Abastecimento(id_veiculo=veiculo.id, data_hora=INICIO + timedelta(days=1), quilometragem=900, litros=40, valor_total=240)])
+    db.flush()
+    db.query(models.Abastecimento).filter(models.Abastecimento.quilometragem == 5).update({"data_hora": None})
+    db.commit()
+    pontuacao_fraude.pontuar(db)
+    motivos = dict(db.query(models.Abastecimento.quilometragem, models.Abastecimento.motivos_fraude).filter(models.Abastecimento.id_veiculo == veiculo.id))
+    assert motivos == {5: None, 1000: None, 900: "KM_REGREDIU"}
@@ -0,0 +1,13 @@
+import storage_client
+
+def test_sem_storage_so_o_envio_de_fotos_para(cliente, monkeypatch):
+    import main
+    monkeypatch.setattr(storage_client, "STORAGE_BACKEND", None)
+    monkeypatch.setattr(storage_client, "_backend", None)
+    monkeypatch.setitem(main._estado, "storage", None)
+    assert main._verificar_storage() is False  # não levanta: o startup segue
+
+    assert cliente.get("/setores/").status_code == 200
+    resposta = cliente.post("/abastecimentos/1/fotos/", data={"tipo_foto": "PLACA"}, files={"arquivo": ("p.jpg", b"\xff\xd8\xff", "image/jpeg")})
+    assert resposta.status_code == 503
+    assert "STORAGE_BACKEND=local" in resposta.json()["detail"]
@@ -0,0 +1,35 @@
+import io
+import hashlib
+from PIL import Image
+import imagens
+import ocr_cache
+import upload_buffer
+
+class _Upload:
+    def __init__(self, conteudo, filename="foto.png", content_type="image/png"):
+        self.file, self.filename, self.content_type = io.BytesIO(conteudo), filename, content_type
+
+def _png(lado):
+    saida = io.BytesIO()
+    Image.effect_noise((lado, lado), 64).convert("RGB").save(saida, "PNG")
+    return saida.getvalue()
+
+def test_upload_grande_fica_em_disco_e_e_lido_em_blocos(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_buffer, "UPLOAD_MAX_MEMORIA", 64 * 1024)
+    original = _png(2400)
+    with upload_buffer.receber(_Upload(original)) as recebido:
+        origem = recebido.abrir()
+        assert not isinstance(origem, bytes)  # o arquivo temporário, não uma cópia em memória
+        assert ocr_cache.chave(origem) == recebido.sha256 == hashlib.sha256(original).hexdigest()
+        reduzida = imagens.reduzir(recebido.abrir())
+        assert max(Image.open(io.BytesIO(reduzida)).size) == imagens.IMAGEM_LADO_MAX
+        recebido.salvar(str(tmp_path / "fila" / "foto.png"))
+    assert (tmp_path / "fila" / "foto.png").read_bytes() == original
+
+def test_upload_pequeno_fica_em_memoria(tmp_path):
+    original = _png(64)
+    with upload_buffer.receber(_Upload(original)) as recebido:
+        assert recebido.abrir() == original
+        assert recebido.abrir() is recebido.abrir()  # sem cópias
+        recebido.salvar(str(tmp_path / "foto.png"))
+    assert (tmp_path / "foto.png").read_bytes() == original
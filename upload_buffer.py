@@ -0,0 +1,89 @@
+import os
+import hashlib
+import shutil
+import tempfile
+
+# Lê o upload uma única vez para um buffer em memória, calculando o SHA-256 durante a leitura.
+# Acima de UPLOAD_MAX_MEMORIA o conteúdo vai para um arquivo temporário anônimo
+# (já apagado do disco ao ser criado, então nada fica para trás se o processo cair).
+UPLOAD_MAX_MEMORIA = int(os.getenv("UPLOAD_MAX_MEMORIA", str(16 * 1024 * 1024)))
+BLOCO = 1024 * 1024
+
+class ArquivoRecebido:
+    def __init__(self, nome_original, content_type):
+        self.nome_original = nome_original or ""
+        self.content_type = content_type or "application/octet-stream"
+        self.tamanho = 0
+        self.sha256 = None
+        self._partes = []
+        self._bytes = None
+        self._disco = None
+
+    @property
+    def extensao(self):
+        return self.nome_original.split(".")[-1] if "." in self.nome_original else "jpg"
+
+    def abrir(self):
+        """Conteúdo para leitura: os bytes, se couberam na memória (sempre o mesmo objeto, sem cópias),
+        ou o arquivo temporário no início, para quem chama ler em blocos sem carregar tudo."""
+        if self._disco is not None:
+            self._disco.seek(0)
+            return self._disco
+        if self._bytes is None:
+            self._bytes = b"".join(self._partes)
+            self._partes = []
+        return self._bytes
+
+    def _escrever(self, bloco, hasher):
+        hasher.update(bloco)
+        self.tamanho += len(bloco)
+        if self._disco is not None:
+            self._disco.write(bloco)
+            return
+        self._partes.append(bloco)
+        if self.tamanho > UPLOAD_MAX_MEMORIA:
+            self._disco = tempfile.TemporaryFile()
+            for parte in self._partes: self._disco.write(parte)
+            self._partes = []
+
+    def salvar(self, caminho):
+        """Grava o conteúdo em disco de forma atômica (usado pela fila de análise)."""
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        origem = self.abrir()
+        with open(temporario, "wb") as destino:
+            if isinstance(origem, bytes): destino.write(origem)
+            else: shutil.copyfileobj(origem, destino, BLOCO)
+        os.replace(temporario, caminho)
+
+    def fechar(self):
+        self._partes = []
+        self._bytes = None
+        if self._disco is not None:
+            self._disco.close()
+            self._disco = None
+
+    def __enter__(self): return self
+    def __exit__(self, *erro): self.fechar()
+
+def receber(arquivo):
+    """Consome um UploadFile (síncrono) e devolve um ArquivoRecebido."""
+    recebido = ArquivoRecebido(arquivo.filename, arquivo.content_type)
+    hasher = hashlib.sha256()
+    while True:
+        bloco = arquivo.file.read(BLOCO)
+        if not bloco: break
+        recebido._escrever(bloco, hasher)
+    recebido.sha256 = hasher.hexdigest()
+    return recebido
+
+async def receber_async(arquivo):
+    """Igual a receber(), para rotas async def."""
+    recebido = ArquivoRecebido(arquivo.filename, arquivo.content_type)
+    hasher = hashlib.sha256()
+    while True:
+        bloco = await arquivo.read(BLOCO)
+        if not bloco: break
+        recebido._escrever(bloco, hasher)
+    recebido.sha256 = hasher.hexdigest()
+    return recebido
@@ -0,0 +1,142 @@
+# verificar_indices.py
+"""Confere se as consultas quentes da API usam índice (nenhum Seq Scan) num banco semeado.
+
+Uso (aponte para um banco Postgres DESCARTÁVEL: ele é migrado e populado):
+    VERIFICAR_INDICES_URL=postgresql://... python verificar_indices.py [--veiculos 20000] [--abastecimentos 500000]
+
+Sai com código 1 se alguma consulta fizer Seq Scan numa das tabelas grandes.
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+import geo
+
+LOTE_GEOHASH = 20000
+TABELAS_GRANDES = {"abastecimentos", "fotos_abastecimento", "veiculos", "usuarios", "analises_foto"}
+
+# (nome, SQL) — as mesmas formas de consulta que o main.py gera
+CONSULTAS = [
+    ("login / get_usuario_atual", "SELECT * FROM usuarios WHERE email = :email"),
+    ("identificar_veiculo (placa)", "SELECT * FROM veiculos WHERE placa = :placa"),
+    ("listar_abastecimentos (1ª página)", "SELECT * FROM abastecimentos ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("listar_abastecimentos (cursor)", "SELECT * FROM abastecimentos WHERE data_hora < :data OR (data_hora = :data AND id < :id) ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("listar_abastecimentos ?id_veiculo", "SELECT * FROM abastecimentos WHERE id_veiculo = :id_veiculo ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("listar_abastecimentos ?status", "SELECT * FROM abastecimentos WHERE status = 'PENDENTE_VALIDACAO' ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("listar_abastecimentos ?id_usuario", "SELECT * FROM abastecimentos WHERE id_usuario = :id_usuario ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("listar_abastecimentos ?id_setor", "SELECT * FROM abastecimentos WHERE id_veiculo IN (SELECT id FROM veiculos WHERE id_setor = :id_setor) ORDER BY data_hora DESC, id DESC LIMIT 101"),
+    ("selectinload das fotos", "SELECT * FROM fotos_abastecimento WHERE id_abastecimento IN (SELECT id FROM abastecimentos ORDER BY data_hora DESC, id DESC LIMIT 100)"),
+    ("listar_veiculos ?status", "SELECT * FROM veiculos WHERE status = 'VENDIDO' AND id > 0 ORDER BY id LIMIT 101"),
+    ("listar_veiculos ?id_setor", "SELECT * FROM veiculos WHERE id_setor = :id_setor ORDER BY id LIMIT 101"),
+    ("abastecimentos/area e /proximos (geohash)", "SELECT id, gps_lat, gps_long FROM abastecimentos WHERE (" +
+     " OR ".join(f"geohash BETWEEN '{a}' AND '{b}'" for a, b in geo.cobertura(-29.6, -29.5, -50.6, -50.5)) +
+     ") AND gps_lat BETWEEN -29.6 AND -29.5 AND gps_long BETWEEN -50.6 AND -50.5"),
+    ("limpeza_vendidos", "SELECT id FROM veiculos WHERE status = 'VENDIDO' AND data_venda < :limite AND NOT EXISTS (SELECT 1 FROM abastecimentos WHERE abastecimentos.id_veiculo = veiculos.id) ORDER BY data_venda LIMIT 500"),
+]
+
+def semear(conn, n_veiculos, n_abastecimentos):
+    """Popula com INSERT ... SELECT generate_series (só o que faltar para chegar na escala pedida)."""
+    conn.execute(text("SELECT setseed(0.42)"))
+    conn.execute(text("INSERT INTO setores (nome) SELECT 'Setor ' || i FROM generate_series(1, 20) i ON CONFLICT DO NOTHING"))
+    if conn.execute(text("SELECT count(*) FROM usuarios")).scalar() < 500:
+        conn.execute(text("""
+            INSERT INTO usuarios (nome, email, senha_hash, perfil, ativo, id_setor)
+            SELECT 'Usuário ' || i, 'seed' || i || '@sga.com', 'x', 'EXECUTOR', true, (SELECT min(id) FROM setores) + i % 20
+            FROM generate_series(1, 500) i ON CONFLICT DO NOTHING"""))
+    faltam = n_veiculos - conn.execute(text("SELECT count(*) FROM veiculos")).scalar()
+    if faltam > 0:
+        conn.execute(text("""
+            INSERT INTO veiculos (placa, modelo, id_setor, status, data_venda)
+            SELECT 'S' || md5(random()::text || i)::varchar(6), 'Modelo ' || i % 50, (SELECT min(id) FROM setores) + i % 20,
+                   CASE WHEN i % 50 = 0 THEN 'VENDIDO' ELSE 'ESTOQUE' END,
+                   CASE WHEN i % 50 = 0 THEN now() - (i % 96) * interval '1 hour' END
+            FROM generate_series(1, :n) i ON CONFLICT DO NOTHING"""), {"n": faltam})
+    faltam = n_abastecimentos - conn.execute(text("SELECT count(*) FROM abastecimentos")).scalar()
+    if faltam > 0:
+        conn.execute(text("""
+            WITH v AS (SELECT array_agg(id) ids FROM veiculos WHERE status <> 'VENDIDO'),
+                 u AS (SELECT array_agg(id) ids FROM usuarios)
+            INSERT INTO abastecimentos (id_usuario, id_veiculo, data_hora, valor_total, litros, nome_posto, status, quilometragem, gps_lat, gps_long)
+            SELECT u.ids[1 + i % array_length(u.ids, 1)], v.ids[1 + (i * 7) % array_length(v.ids, 1)],
+                   now() - i * interval '1 minute', 150 + random() * 200, 30 + random() * 20, 'Posto ' || i % 300,
+                   CASE WHEN i % 100 = 0 THEN 'PENDENTE_VALIDACAO' WHEN i % 37 = 0 THEN 'REPROVADO' ELSE 'APROVADO' END,
+                   i, -30 + random(), -51 + random()
+            FROM generate_series(1, :n) i, v, u"""), {"n": faltam})
+        conn.execute(text("""
+            INSERT INTO fotos_abastecimento (id_abastecimento, tipo, url_arquivo)
+            SELECT a.id, t.tipo, 'seed/' || a.id || '_' || t.tipo || '.jpg'
+            FROM abastecimentos a CROSS JOIN (VALUES ('PLACA'), ('PAINEL')) t(tipo)
+            WHERE NOT EXISTS (SELECT 1 FROM fotos_abastecimento f WHERE f.id_abastecimento = a.id)"""))
+    preencher_geohash(conn)
+    conn.execute(text("ANALYZE"))
+
+def preencher_geohash(conn):
+    """Geohash das linhas semeadas, em lotes, com o mesmo geo.codificar da API (como a migração 0005)."""
+    ultimo = 0
+    while True:
+        linhas = conn.execute(text(
+            "SELECT id, gps_lat, gps_long FROM abastecimentos WHERE id > :ultimo AND geohash IS NULL "
+            "AND gps_lat IS NOT NULL AND gps_long IS NOT NULL ORDER BY id LIMIT :lote"), {"ultimo": ultimo, "lote": LOTE_GEOHASH}).all()
+        if not linhas: return
+        ultimo = linhas[-1].id
+        # Um UPDATE por lote (unnest dos arrays), não um por linha
+        conn.execute(text("UPDATE abastecimentos a SET geohash = d.geohash FROM unnest(:ids, :geohashes) d(id, geohash) WHERE a.id = d.id"),
+                     {"ids": [l.id for l in linhas], "geohashes": [geo.codificar(l.gps_lat, l.gps_long) for l in linhas]})
+
+def _seq_scans(plano):
+    encontrados = []
+    if plano.get("Node Type") == "Seq Scan" and plano.get("Relation Name") in TABELAS_GRANDES:
+        encontrados.append(plano["Relation Name"])
+    for filho in plano.get("Plans", []): encontrados += _seq_scans(filho)
+    return encontrados
+
+def verificar(conn):
+    exemplo = conn.execute(text("SELECT id, data_hora, id_veiculo, id_usuario FROM abastecimentos ORDER BY data_hora DESC, id DESC OFFSET 1000 LIMIT 1")).first()
+    parametros = {
+        "email": conn.execute(text("SELECT email FROM usuarios ORDER BY id LIMIT 1")).scalar(),
+        "placa": conn.execute(text("SELECT placa FROM veiculos ORDER BY id LIMIT 1")).scalar(),
+        "id": exemplo.id, "data": exemplo.data_hora, "id_veiculo": exemplo.id_veiculo, "id_usuario": exemplo.id_usuario,
+        "id_setor": conn.execute(text("SELECT min(id) FROM setores")).scalar(),
+        "limite": datetime.utcnow() - timedelta(hours=48),
+    }
+    falhas = 0
+    for nome, sql in CONSULTAS:
+        plano = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), parametros).scalar()
+        if isinstance(plano, str): plano = json.loads(plano)
+        tabelas = _seq_scans(plano[0]["Plan"])
+        if tabelas:
+            falhas += 1
+            print(f"❌ {nome}: Seq Scan em {', '.join(sorted(set(tabelas)))}")
+        else:
+            print(f"✅ {nome}")
+    return falhas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--veiculos", type=int, default=20000)
+    parser.add_argument("--abastecimentos", type=int, default=500000)
+    args = parser.parse_args()
+
+    url = os.getenv("VERIFICAR_INDICES_URL")
+    if not url:
+        print("❌ Defina VERIFICAR_INDICES_URL (banco descartável).")
+        sys.exit(2)
+
+    # As migrações usam o DATABASE_URL do database.py
+    os.environ["DATABASE_URL"] = url
+    from alembic import command
+    from alembic.config import Config
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
+
+    engine = create_engine(url.replace("postgres://", "postgresql://", 1))
+    with engine.begin() as conn:
+        print(f"🌱 Semeando ({args.veiculos} veículos, {args.abastecimentos} abastecimentos)...")
+        semear(conn, args.veiculos, args.abastecimentos)
+    with engine.connect() as conn:
+        falhas = verificar(conn)
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
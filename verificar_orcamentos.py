@@ -0,0 +1,159 @@
+# verificar_orcamentos.py
+"""Confere o orçamento de queries de cada rota (@orcamento_queries.limite) contra um banco semeado.
+
+Uso (por padrão cria um SQLite temporário; para Postgres, aponte para um banco DESCARTÁVEL):
+    python verificar_orcamentos.py [--veiculos 300] [--abastecimentos 600]
+    VERIFICAR_ORCAMENTOS_URL=postgresql://... python verificar_orcamentos.py
+
+Cada rota é chamada uma vez, com os caches do processo frios (o pior caso). Sai com código 1 se
+alguma rota estourar o orçamento, repetir o mesmo comando (N+1) ou não declarar orçamento.
+Rotas isentas (limite(None, motivo=...)) são listadas com o motivo e só precisam responder o status esperado.
+Os tamanhos da semeadura são maiores que uma página de propósito: N+1 aparece como estouro.
+"""
+import os
+import sys
+import io
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+def semear(db, models, auth, n_veiculos, n_abastecimentos):
+    aleatorio = random.Random(42)
+    setores = [models.Setor(nome=f"Setor {i}") for i in range(1, 6)]
+    db.add_all(setores)
+    db.flush()
+    db.add(models.Usuario(nome="Admin", email="admin@sga.com", senha_hash=auth.get_password_hash("admin123"), perfil="ADMIN"))
+    db.add_all([models.Usuario(nome=f"Usuário {i}", email=f"seed{i}@sga.com", senha_hash="x", perfil="EXECUTOR", id_setor=setores[i % 5].id)
+                for i in range(150)])
+    db.add_all([models.Veiculo(placa=f"SGA{i:04d}", modelo=f"Modelo {i % 20}", id_setor=setores[i % 5].id, capacidade_tanque=55,
+                               status="VENDIDO" if i % 50 == 0 else "ESTOQUE") for i in range(n_veiculos)])
+    db.flush()
+    veiculos = [v.id for v in db.query(models.Veiculo.id).filter(models.Veiculo.status != "VENDIDO")]
+    usuarios = [u.id for u in db.query(models.Usuario.id)]
+    agora = datetime.utcnow()
+    abastecimentos = [models.Abastecimento(id_usuario=usuarios[i % len(usuarios)], id_veiculo=veiculos[i % len(veiculos)],
+                                           data_hora=agora - timedelta(minutes=i), valor_total=200 + aleatorio.random() * 100,
+                                           litros=40, nome_posto=f"Posto {i % 10}", quilometragem=1000 + i * 10,
+                                           gps_lat=-30 + aleatorio.random() * 0.2, gps_long=-51.2 + aleatorio.random() * 0.2,
+                                           status="APROVADO" if i % 10 else "PENDENTE_VALIDACAO")
+                      for i in range(n_abastecimentos)]
+    db.add_all(abastecimentos)
+    db.flush()
+    db.add_all([models.FotoAbastecimento(id_abastecimento=a.id, tipo=tipo, url_arquivo=f"seed/{a.id}_{tipo}.jpg")
+                for a in abastecimentos for tipo in ("PLACA", "PAINEL")])
+    db.add_all([models.AnaliseFoto(id_abastecimento=abastecimentos[0].id, tipo=tipo, nome_arquivo=f"seed_{tipo}.jpg", status="CONCLUIDA")
+                for tipo in ("PLACA", "PAINEL", "BOMBA", "OUTRA")])
+    db.commit()
+    return abastecimentos[0].id
+
+def _csv_veiculos(n, prefixo="IMP"):
+    linhas = ["placa;modelo;setor"] + [f"{prefixo}{i:04d};Importado {i};Setor {1 + i % 5}" for i in range(n)]
+    return io.BytesIO("\n".join(linhas).encode())
+
+def casos(id_abastecimento):
+    """(nome, método, caminho, kwargs do TestClient, status esperado). A ordem importa (cria antes de editar/apagar)."""
+    area = "lat_min=-30.1&lat_max=-29.7&lon_min=-51.3&lon_max=-50.9"
+    return [
+        ("listar setores", "GET", "/setores/", {}, 200),
+        ("criar setor", "POST", "/setores/", {"json": {"nome": "Setor Novo"}}, 200),
+        ("listar veículos", "GET", "/veiculos/", {}, 200),
+        ("listar veículos (filtro + fields)", "GET", "/veiculos/?status=ESTOQUE&fields=id,placa", {}, 200),
+        ("criar veículo", "POST", "/veiculos/", {"json": {"placa": "NOV0001", "modelo": "Novo"}}, 200),
+        ("atualizar veículo", "PUT", "/veiculos/{id_veiculo_novo}", {"json": {"cor": "Azul", "status": "PATIO"}}, 200),
+        ("importar 200 veículos", "POST", "/veiculos/importar", {"files": {"arquivo": ("frota.csv", _csv_veiculos(200), "text/csv")}}, 200),
+        # Vários lotes (IMPORTACAO_LOTE = 1000): a rota é isenta, mas tem que continuar respondendo 200
+        ("importar 2500 veículos", "POST", "/veiculos/importar", {"files": {"arquivo": ("frota.csv", _csv_veiculos(2500, "LOT"), "text/csv")}}, 200),
+        ("identificar veículo (sem Vision)", "POST", "/identificar_veiculo/", {"files": {"arquivo": ("p.jpg", b"\xff\xd8\xff", "image/jpeg")}}, 404),
+        ("ler km (sem Vision)", "POST", "/assistente/ler_km/", {"files": {"arquivo": ("p.jpg", b"\xff\xd8\xff", "image/jpeg")}}, 404),
+        ("registrar abastecimento", "POST", "/abastecimentos/", {"json": {"id_veiculo": "{id_veiculo_novo}", "valor_total": 250, "litros": 45, "quilometragem": 5000}}, 200),
+        ("listar abastecimentos", "GET", "/abastecimentos/", {}, 200),
+        ("listar abastecimentos (setor, 500)", "GET", "/abastecimentos/?id_setor={id_setor}&limite=500", {}, 200),
+        ("listar abastecimentos (sem fotos)", "GET", "/abastecimentos/?fields=id,valor_total", {}, 200),
+        ("abastecimentos próximos", "GET", "/abastecimentos/proximos?lat=-29.9&lon=-51.1&raio_km=30", {}, 200),
+        ("abastecimentos na área", "GET", f"/abastecimentos/area?{area}", {}, 200),
+        ("postos", "GET", f"/postos/?{area}", {}, 200),
+        ("exportar", "GET", "/abastecimentos/exportar?formato=ndjson", {}, 200),
+        ("revisar", "PATCH", f"/abastecimentos/{id_abastecimento}/revisar", {"json": {"status": "REPROVADO", "justificativa": "teste"}}, 200),
+        ("enviar foto", "POST", f"/abastecimentos/{id_abastecimento}/fotos/", {"data": {"tipo_foto": "PLACA"}, "files": {"arquivo": ("p.jpg", b"\xff\xd8\xff", "image/jpeg")}}, 202),
+        ("listar fotos", "GET", f"/abastecimentos/{id_abastecimento}/fotos/", {}, 200),
+        ("consultar análise", "GET", "/analises/{id_analise}", {}, 200),
+        ("listar análises", "GET", f"/abastecimentos/{id_abastecimento}/analises", {}, 200),
+        ("relatório de consumo", "GET", "/relatorios/consumo", {}, 200),
+        ("relatório de consumo (setor)", "GET", "/relatorios/consumo?agrupar=setor", {}, 200),
+        ("pontuar fraude", "POST", "/fraude/pontuar", {}, 202),
+        ("criar usuário", "POST", "/usuarios/", {"json": {"nome": "Novo", "email": "novo@sga.com", "senha": "123456", "setor": "Setor 1"}}, 200),
+        ("atualizar usuário", "PUT", "/usuarios/{id_usuario_novo}", {"json": {"nome": "Novo 2", "email": "novo2@sga.com", "senha": "", "setor": "Setor 2"}}, 200),
+        ("listar usuários", "GET", "/usuarios/?limite=500", {}, 200),
+        ("deletar usuário", "DELETE", "/usuarios/{id_usuario_novo}", {}, 200),
+        ("deletar veículo", "DELETE", "/veiculos/{id_veiculo_sem_historico}", {}, 200),
+        ("deletar setor", "DELETE", "/setores/{id_setor_novo}", {}, 200),
+        ("métricas", "GET", "/metrics", {}, 200),
+        ("saúde (vivo)", "GET", "/saude/vivo", {}, 200),
+        ("saúde (pronto)", "GET", "/saude/pronto", {}, 200),
+    ]
+
+def _preencher(valor, ids):
+    if isinstance(valor, str): return valor.format(**ids) if "{" in valor else valor
+    if isinstance(valor, dict): return {k: _preencher(v, ids) for k, v in valor.items()}
+    return valor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--veiculos", type=int, default=300)
+    parser.add_argument("--abastecimentos", type=int, default=600)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="sga_orcamentos_")
+    # Antes de importar o app: banco, modo "erro" (estouro vira 500) e nada de serviço externo
+    os.environ["DATABASE_URL"] = os.getenv("VERIFICAR_ORCAMENTOS_URL") or f"sqlite:///{os.path.join(pasta, 'sga.db')}"
+    os.environ["QUERY_ORCAMENTO_MODO"] = "erro"
+    os.environ["GOOGLE_API_KEY"] = ""
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["STORAGE_LOCAL_DIR"] = os.path.join(pasta, "fotos")
+
+    from fastapi.testclient import TestClient
+    from fastapi.routing import APIRoute
+    import database, models, auth
+    import main as api
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    print(f"🌱 Semeando ({args.veiculos} veículos, {args.abastecimentos} abastecimentos)...")
+    id_abastecimento = semear(db, models, auth, args.veiculos, args.abastecimentos)
+
+    falhas = 0
+    for r in api.app.routes:
+        if not isinstance(r, APIRoute): continue
+        rota = f"{', '.join(sorted(r.methods))} {r.path}"
+        if not hasattr(r.endpoint, "max_queries"):
+            falhas += 1
+            print(f"❌ {rota}: sem @orcamento_queries.limite")
+        elif r.endpoint.sem_orcamento:
+            print(f"ℹ️ {rota}: fora do orçamento ({r.endpoint.sem_orcamento})")
+
+    # Um event loop só para todas as chamadas (o pool do asyncpg fica preso ao loop)
+    with TestClient(api.app) as cliente:
+        token = cliente.post("/auth/login", data={"username": "admin@sga.com", "password": "admin123"}).json()["access_token"]
+        cabecalhos = {"Authorization": f"Bearer {token}"}
+        ids = {"id_setor": db.query(models.Setor.id).order_by(models.Setor.id).first()[0],
+               "id_analise": db.query(models.AnaliseFoto.id).first()[0],
+               "id_veiculo_sem_historico": db.query(models.Veiculo.id).filter(models.Veiculo.status == "VENDIDO").order_by(models.Veiculo.id.desc()).first()[0]}
+        for nome, metodo, caminho, kwargs, esperado in casos(id_abastecimento):
+            resposta = cliente.request(metodo, _preencher(caminho, ids), headers=cabecalhos, **_preencher(kwargs, ids))
+            total = resposta.headers.get("x-query-count", "?")
+            if resposta.status_code != esperado:
+                falhas += 1
+                detalhe = resposta.json().get("problemas") if resposta.headers.get("content-type") == "application/json" else None
+                print(f"❌ {nome}: HTTP {resposta.status_code} (esperado {esperado}), {total} queries" + (f": {detalhe}" if detalhe else ""))
+                continue
+            print(f"✅ {nome}: {total} queries")
+            # ids criados pelos casos anteriores
+            if nome == "criar setor": ids["id_setor_novo"] = resposta.json()["id"]
+            if nome == "criar veículo": ids["id_veiculo_novo"] = resposta.json()["id"]
+            if nome == "criar usuário": ids["id_usuario_novo"] = db.query(models.Usuario.id).filter(models.Usuario.email == "novo@sga.com").scalar()
+    db.close()
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
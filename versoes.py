@@ -0,0 +1,47 @@
+import os
+import time
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# Contador de versão por recurso ("setores", "veiculos"...), guardado na tabela versoes_recursos.
+# As escritas incrementam o contador na mesma transação; os caches em memória comparam a versão
+# que carregaram com a atual. Cada processo só relê a versão do banco a cada VERSAO_TTL segundos,
+# então no dia a dia uma leitura não custa query nenhuma.
+VERSAO_TTL = float(os.getenv("VERSAO_TTL", "5"))
+
+_lock = threading.Lock()
+_locais = {} # chave -> (valor, conferido_em)
+
+def atual(db, chave):
+    item = _locais.get(chave)
+    if item and time.monotonic() - item[1] < VERSAO_TTL: return item[0]
+    linha = db.get(models.VersaoRecurso, chave, populate_existing=True)
+    valor = linha.valor if linha else 0
+    with _lock: _locais[chave] = (valor, time.monotonic())
+    return valor
+
+def incrementar(db, chave):
+    """Chame antes do commit da escrita. O cache local é invalidado quando o commit acontecer."""
+    atualizados = db.query(models.VersaoRecurso).filter(models.VersaoRecurso.chave == chave).update(
+        {"valor": models.VersaoRecurso.valor + 1}, synchronize_session=False)
+    if not atualizados:
+        try:
+            with db.begin_nested(): db.add(models.VersaoRecurso(chave=chave, valor=1))
+        except IntegrityError: # outro processo criou a linha ao mesmo tempo
+            db.query(models.VersaoRecurso).filter(models.VersaoRecurso.chave == chave).update(
+                {"valor": models.VersaoRecurso.valor + 1}, synchronize_session=False)
+    db.info.setdefault("versoes_alteradas", set()).add(chave)
+
+@event.listens_for(Session, "after_commit")
+def _apos_commit(session):
+    alteradas = session.info.pop("versoes_alteradas", None)
+    if alteradas:
+        with _lock:
+            for chave in alteradas: _locais.pop(chave, None)
+
+@event.listens_for(Session, "after_rollback")
+def _apos_rollback(session):
+    session.info.pop("versoes_alteradas", None)